@@ -0,0 +1,389 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timedelta
+
+from flask import Blueprint, Response, current_app, request, stream_with_context
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from bookings import Booking, booked, clashes, insert_shows, unknown_references
+from cache import page_cache, VENUES_PAGE, venue_page, artist_page
+from counters import refresh_counters
+from instrumentation import query_budget
+from models import db, Venue, Artist, Show
+from pagination import after_show, show_cursor, take_page
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# Fields a client may request with ?fields=, mapped to the selected column.
+
+VENUE_FIELDS = {
+    'id': Venue.id,
+    'name': Venue.name,
+    'city': Venue.city,
+    'state': Venue.state,
+    'address': Venue.address,
+    'phone': Venue.phone,
+    'genres': Venue.genres,
+    'image_link': Venue.image_link,
+    'facebook_link': Venue.facebook_link,
+    'website': Venue.website,
+    'seeking_talent': Venue.seeking_talent,
+    'seeking_description': Venue.seeking_description,
+    'upcoming_shows_count': Venue.upcoming_shows_count,
+    'past_shows_count': Venue.past_shows_count,
+    'next_show_at': Venue.next_show_at,
+    'latitude': Venue.latitude,
+    'longitude': Venue.longitude,
+    'updated_at': Venue.updated_at,
+}
+
+ARTIST_FIELDS = {
+    'id': Artist.id,
+    'name': Artist.name,
+    'city': Artist.city,
+    'state': Artist.state,
+    'phone': Artist.phone,
+    'genres': Artist.genres,
+    'image_link': Artist.image_link,
+    'facebook_link': Artist.facebook_link,
+    'website_link': Artist.website_link,
+    'seeking_venue': Artist.seeking_venue,
+    'seeking_description': Artist.seeking_description,
+    'upcoming_shows_count': Artist.upcoming_shows_count,
+    'past_shows_count': Artist.past_shows_count,
+    'next_show_at': Artist.next_show_at,
+    'updated_at': Artist.updated_at,
+}
+
+SHOW_FIELDS = {
+    'id': Show.id,
+    'start_time': Show.start_time,
+    'venue_id': Show.venue_id,
+    'venue_name': Venue.name,
+    'venue_image_link': Venue.image_link,
+    'artist_id': Show.artist_id,
+    'artist_name': Artist.name,
+    'artist_image_link': Artist.image_link,
+}
+
+# Tables dumped by the catalog export.
+
+EXPORTS = {
+    'venues': Venue,
+    'artists': Artist,
+    'shows': Show,
+}
+
+EXPORT_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+
+    return json.dumps(payload, separators=(',', ':'), default=datetime.isoformat)
+
+def json_response(payload, status=200):
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+def requested_fields(available):
+    """Resolve ?fields=a,b into field names, always including the id."""
+    fields = request.args.get('fields')
+    if not fields:
+        return list(available)
+
+    names = ['id'] + [name for name in dict.fromkeys(fields.split(',')) if name and name != 'id']
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ApiError(400, 'Unknown fields: {}'.format(', '.join(unknown)))
+
+    return names
+
+def page_size():
+    try:
+        limit = int(request.args.get('limit', current_app.config['API_PAGE_SIZE']))
+    except ValueError:
+        raise ApiError(400, 'limit must be an integer')
+
+    return max(1, min(limit, current_app.config['API_MAX_PAGE_SIZE']))
+
+def project(query, available, names):
+    return query.with_entities(*(available[name] for name in names))
+
+def as_dicts(names, rows):
+    return [dict(zip(names, row)) for row in rows]
+
+
+@api.errorhandler(ApiError)
+def api_error(error):
+    return json_response({'error': error.message}, error.status)
+
+
+def list_entities(model, available):
+    names = requested_fields(available)
+    limit = page_size()
+    query = project(db.session.query(model), available, names)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            query = query.filter(model.id > int(cursor))
+        except ValueError:
+            raise ApiError(400, 'Malformed cursor')
+
+    rows = query.order_by(model.id).limit(limit + 1).all()
+    rows, next_cursor = take_page(rows, limit, lambda row: str(row[0]))
+
+    return json_response({'data': as_dicts(names, rows), 'next_cursor': next_cursor})
+
+def get_entity(model, available, entity_id):
+    names = requested_fields(available)
+    row = project(db.session.query(model), available, names).filter(model.id == entity_id).first()
+    if row is None:
+        raise ApiError(404, 'Not found')
+
+    return json_response({'data': dict(zip(names, row))})
+
+
+@api.route('/venues')
+@query_budget(1)
+def venues():
+    return list_entities(Venue, VENUE_FIELDS)
+
+@api.route('/venues/<int:venue_id>')
+@query_budget(1)
+def venue(venue_id):
+    return get_entity(Venue, VENUE_FIELDS, venue_id)
+
+@api.route('/artists')
+@query_budget(1)
+def artists():
+    return list_entities(Artist, ARTIST_FIELDS)
+
+@api.route('/artists/<int:artist_id>')
+@query_budget(1)
+def artist(artist_id):
+    return get_entity(Artist, ARTIST_FIELDS, artist_id)
+
+@api.route('/shows')
+@query_budget(1)
+def shows():
+    names = requested_fields(SHOW_FIELDS)
+    limit = page_size()
+    # start_time is always selected to build the cursor
+    columns = names if 'start_time' in names else names + ['start_time']
+
+    query = project(db.session.query(Show), SHOW_FIELDS, columns)
+    if 'venue_name' in names or 'venue_image_link' in names:
+        query = query.join(Venue, Show.venue_id == Venue.id)
+    if 'artist_name' in names or 'artist_image_link' in names:
+        query = query.join(Artist, Show.artist_id == Artist.id)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            query = after_show(query, cursor)
+        except ValueError:
+            raise ApiError(400, 'Malformed cursor')
+
+    rows = query.order_by(Show.start_time, Show.id).limit(limit + 1).all()
+    start_time = columns.index('start_time')
+    rows, next_cursor = take_page(rows, limit, lambda row: show_cursor(row[start_time], row[0]))
+
+    return json_response({'data': as_dicts(names, rows), 'next_cursor': next_cursor})
+
+
+def read_bookings(payload):
+    """Parse {"shows": [{"artist_id", "venue_id", "start_time"}, ...]}."""
+    shows = payload.get('shows') if isinstance(payload, dict) else None
+    if not isinstance(shows, list) or not shows:
+        raise ApiError(400, 'Expected a JSON object with a non-empty "shows" list')
+
+    limit = current_app.config['API_MAX_BATCH_SIZE']
+    if len(shows) > limit:
+        raise ApiError(400, 'At most {} shows can be created at once'.format(limit))
+
+    bookings = []
+    for number, show in enumerate(shows):
+        try:
+            booking = Booking(
+                artist_id=int(show['artist_id']),
+                venue_id=int(show['venue_id']),
+                start_time=datetime.fromisoformat(show['start_time']),
+            )
+        except (KeyError, TypeError, ValueError):
+            booking = None
+        # Show times are stored as local times, like those of the show form
+        if booking is None or booking.start_time.tzinfo is not None:
+            raise ApiError(400, 'shows[{}] needs an integer artist_id and venue_id, '
+                'and an ISO 8601 start_time without a UTC offset'.format(number))
+        bookings.append(booking)
+    return bookings
+
+def describe(bookings):
+    return '; '.join(
+        'artist {} at venue {} on {}'.format(booking.artist_id, booking.venue_id, booking.start_time.isoformat())
+        for booking in bookings
+    )
+
+@api.route('/shows', methods=['POST'])
+@query_budget(4)
+def create_shows():
+    """Create many shows in one transaction, such as a weekly residency.
+
+    Either every show is created or, on the first problem found, none is:
+    400 for an unknown artist or venue, 409 for a show at the same time as
+    another of its venue or artist, in the batch or already listed.
+    """
+    bookings = read_bookings(request.get_json(silent=True))
+
+    clashing = clashes(bookings)
+    if clashing:
+        raise ApiError(409, 'Double booked within the batch: ' + describe(clashing))
+
+    artist_ids, venue_ids = unknown_references(bookings)
+    if artist_ids or venue_ids:
+        raise ApiError(400, 'Unknown artist ids: {}; unknown venue ids: {}'.format(
+            ', '.join(map(str, artist_ids)) or 'none', ', '.join(map(str, venue_ids)) or 'none'))
+
+    try:
+        ids = insert_shows(bookings)
+    except IntegrityError:
+        db.session.rollback()
+        raise ApiError(409, 'Already booked: ' + describe(booked(bookings)))
+
+    now = datetime.now()
+    venue_ids = {booking.venue_id for booking in bookings}
+    artist_ids = {booking.artist_id for booking in bookings}
+    refresh_counters(Venue, Show.venue_id, Venue.id.in_(venue_ids), now)
+    refresh_counters(Artist, Show.artist_id, Artist.id.in_(artist_ids), now)
+    db.session.commit()
+
+    page_cache.invalidate(VENUES_PAGE, *map(venue_page, venue_ids), *map(artist_page, artist_ids))
+
+    return json_response({
+        'data': [dict(booking._asdict(), id=show_id) for show_id, booking in zip(ids, bookings)],
+    }, 201)
+
+
+def export_columns(model):
+    """Every stored column of model; generated search vectors are left out."""
+    return [column for column in model.__table__.columns if column.computed is None]
+
+def export_watermark(model):
+    """(until, watermark) of an export of model.
+
+    Rows are exported up to until, the latest updated_at. The next
+    incremental export starts from watermark, EXPORT_WATERMARK_OVERLAP
+    earlier, so it also picks up rows that transactions still in flight
+    commit with an older updated_at. Rows in the overlap are exported
+    twice, and consumers should upsert them by id. Deleted rows are never
+    exported; only a full export shows which rows are gone.
+    """
+    until = db.session.query(func.max(model.updated_at)).scalar()
+    if until is None:
+        return None, None
+    return until, until - timedelta(seconds=current_app.config['EXPORT_WATERMARK_OVERLAP'])
+
+def export_chunks(model, fmt, since=None, until=None):
+    """Stream a table as encoded chunks, one per server-side cursor batch.
+
+    Only rows with since < updated_at <= until are exported. Rows are read
+    through a server-side cursor, so memory stays flat whatever the table
+    size.
+    """
+    columns = export_columns(model)
+    names = [column.name for column in columns]
+
+    query = select(*columns).order_by(model.id)
+    if since is not None:
+        query = query.where(model.updated_at > since)
+    if until is not None:
+        query = query.where(model.updated_at <= until)
+
+    query = query.execution_options(yield_per=current_app.config['EXPORT_BATCH_SIZE'])
+    batches = db.session.execute(query).partitions()
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(names)
+        yield buffer.getvalue().encode('utf-8')
+
+        for rows in batches:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue().encode('utf-8')
+    else:
+        for rows in batches:
+            yield b''.join(ndjson_line(names, row) for row in rows)
+
+def ndjson_line(names, row):
+    line = dumps(dict(zip(names, row)))
+    return (line if isinstance(line, bytes) else line.encode('utf-8')) + b'\n'
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+@api.route('/export/<kind>')
+@query_budget(1)
+def export(kind):
+    """Stream a whole table as NDJSON or CSV.
+
+    The budget only covers the watermark query: rows are read while the
+    response streams, after the request's queries have been reported.
+
+    ?since= restricts the dump to rows updated after that time. The
+    X-Export-Watermark header holds the ?since= of the next incremental
+    export (see export_watermark).
+    """
+    if kind not in EXPORTS:
+        raise ApiError(404, 'Not found')
+
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_MIMETYPES:
+        raise ApiError(400, 'format must be one of: {}'.format(', '.join(EXPORT_MIMETYPES)))
+
+    since = request.args.get('since')
+    if since:
+        try:
+            since = datetime.fromisoformat(since)
+        except ValueError:
+            raise ApiError(400, 'since must be an ISO 8601 timestamp')
+
+    model = EXPORTS[kind]
+    until, next_since = export_watermark(model)
+    chunks = export_chunks(model, fmt, since or None, until)
+
+    headers = {'Vary': 'Accept-Encoding'}
+    if next_since is not None:
+        headers['X-Export-Watermark'] = next_since.isoformat()
+    if 'gzip' in request.accept_encodings:
+        chunks = gzipped(chunks)
+        headers['Content-Encoding'] = 'gzip'
+
+    return Response(stream_with_context(chunks), mimetype=EXPORT_MIMETYPES[fmt], headers=headers)
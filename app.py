@@ -2,149 +2,242 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, jsonify
-from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
+import click
+from flask import Blueprint, Flask, current_app, render_template, stream_template, request, Response, flash, redirect, url_for, abort, jsonify
+from flask.cli import ScriptInfo, with_appcontext
 import logging
 from logging import Formatter, FileHandler
-from flask_wtf import Form
-from forms import *
-from flask_migrate import Migrate
-from sqlalchemy import func
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
+import os
 import sys
-from datetime import datetime
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from models import setup_db, db, Artist, Venue, Show, Genre
+from search import search_catalog
+from geo import venues_near
+from counters import show_added, refresh_counters, rollover
+from bookings import Booking, insert_show
+from pagination import after_show, show_cursor, take_page
+from listings import EntityLink, EntitySummary, EntityTile, ArtistShow, VenueShow, ShowListing, artist_shows, venue_shows, split_statements, read
+from pool import pool_metrics
+from instrumentation import setup_instrumentation, query_budget
+from api import api, EXPORTS, EXPORT_MIMETYPES, export_chunks, export_watermark, gzipped
+from cache import setup_cache, page_cache, conditional, INDEX_PAGE, VENUES_PAGE, ARTISTS_PAGE, venue_page, artist_page
+from feed import setup_feed, recent_feed
+
+# Modules needed by only some requests (babel, dateutil, the WTForms forms)
+# or only by the flask command (Flask-Migrate and Alembic, the importer) are
+# imported where they are used, so that a worker starts serving sooner.
 
-from models import setup_db, db, Artist, Venue, Show
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-setup_db(app)
-migrate = Migrate(app, db)
+main = Blueprint('main', __name__)
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+@lru_cache(maxsize=64)
+def datetime_pattern(format, locale):
+  import babel.dates
+  return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)), babel.Locale.parse(locale)
+
+@main.app_template_filter('datetime')
+def format_datetime(value, format='medium', locale='en'):
+  """Format a datetime, or a string dateutil can parse, with a CLDR pattern."""
+  if isinstance(value, str):
+    import dateutil.parser
+    value = dateutil.parser.parse(value)
+  if value.tzinfo is None:
+    value = value.replace(tzinfo=timezone.utc)
+
+  pattern, locale = datetime_pattern(format, locale)
+  return pattern.apply(value, locale)
+
+def split_shows(model, query, now):
+  """Read the upcoming and past shows of a listings query as model tuples."""
+  upcoming_shows, past_shows = split_statements(query, now)
+
+  return read(model, db.session.execute(upcoming_shows)), read(model, db.session.execute(past_shows))
+
+def venue_areas(rows):
+  """Group (city, state, id, name, upcoming_shows_count) rows sorted by
+  city and state into the areas of the venues page, in a single pass."""
+  areas = []
+  for city, state, venue_id, name, upcoming in rows:
+    if not areas or areas[-1]['city'] != city or areas[-1]['state'] != state:
+      areas.append({'city': city, 'state': state, 'venues': []})
+
+    areas[-1]['venues'].append(EntitySummary(venue_id, name, upcoming))
+  return areas
+
+def search_results(count, selection):
+  return {
+    'count': count,
+    'data': read(EntitySummary, selection),
+  }
+
+def home_page():
+  """The home page rendered after a write. It shows the recently listed
+  feed if this worker has it, leaving a rebuild to the next index()."""
+  return render_template('pages/home.html', **(recent_feed.loaded() or {}))
 
-app.jinja_env.filters['datetime'] = format_datetime
+def set_genres(entity, names):
+  names = list(dict.fromkeys(names))
 
-def get_venue_by_city(venues, city):
-  filtered_venues = list(filter(lambda venue: venue.city == city, venues))
+  # Without autoflush, changes made to entity so far are written in a single
+  # UPDATE at commit rather than before each of these reads. Genres added
+  # but not yet flushed are found in the session instead.
+  with db.session.no_autoflush:
+    existing = {genre.name: genre for genre in db.session.new if isinstance(genre, Genre)}
+    existing.update((genre.name, genre) for genre in Genre.query.filter(Genre.name.in_(names)))
+    entity.genres = ','.join(names)
+    entity.genre_tags = [existing.get(name) or Genre(name=name) for name in names]
 
-  formatted_venues = list(map(lambda venue: {
-    "id": venue.id,
-    "name": venue.name,
-    "num_upcoming_shows": len(list(filter(lambda show: show.start_time > datetime.now(), venue.shows))),
-  }, filtered_venues))
+#----------------------------------------------------------------------------#
+# Page validators.
+# Each returns (last_modified, *version) for cache.conditional.
+#----------------------------------------------------------------------------#
 
-  return formatted_venues
+def latest(*timestamps):
+  return max((timestamp for timestamp in timestamps if timestamp is not None), default=None)
+
+def listing_validators(model):
+  last_modified, count = db.session.query(func.max(model.updated_at), func.count(model.id)).one()
+  return last_modified, count
+
+def shows_validators():
+  # Shows are only deleted along with their venue, which refreshes (and so
+  # touches) the counters of their artists, so no row count is needed here.
+  show_updated_at, venue_updated_at, artist_updated_at = db.session.query(
+    db.session.query(func.max(Show.updated_at)).scalar_subquery(),
+    db.session.query(func.max(Venue.updated_at)).scalar_subquery(),
+    db.session.query(func.max(Artist.updated_at)).scalar_subquery()
+  ).one()
+  return (latest(show_updated_at, venue_updated_at, artist_updated_at),)
+
+def detail_validators(model, show_fk, related, related_fk, entity_id):
+  # The next upcoming show is part of the version: once it starts, the page
+  # lists it under past shows, though no row has changed.
+  now = datetime.now()
+  entity_updated_at, show_updated_at, related_updated_at, count, next_show_at = db.session.query(
+    db.session.query(model.updated_at).filter(model.id == entity_id).scalar_subquery(),
+    func.max(Show.updated_at),
+    func.max(related.updated_at),
+    func.count(Show.id),
+    func.min(case((Show.start_time > now, Show.start_time)))
+  ).select_from(Show
+  ).join(related, related_fk == related.id
+  ).filter(show_fk == entity_id
+  ).one()
+
+  if entity_updated_at is None:
+    return None
+
+  return latest(entity_updated_at, show_updated_at, related_updated_at), count, next_show_at
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
+@main.route('/')
+@query_budget(2)
+@page_cache.cached(lambda: INDEX_PAGE)
 def index():
-  artists = db.session.query(Artist).order_by(Artist.id.desc()).limit(10).all()
-  venues = db.session.query(Venue).order_by(Venue.id.desc()).limit(10).all()
-  return render_template('pages/home.html', artists=artists, venues=venues)
+  # No query unless no worker has built the feed yet, or it expired
+  return render_template('pages/home.html', **recent_feed.recent())
 
 
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
+@main.route('/venues')
+@query_budget(2)
+@conditional(lambda: listing_validators(Venue))
+@page_cache.cached(lambda: VENUES_PAGE)
 def venues():
-  cities = db.session.query(Venue.city,
-   func.count(Venue.city)
-   ).group_by(Venue.city)
-  venues = db.session.query(Venue).all()
+  query = db.session.query(
+    Venue.city,
+    Venue.state,
+    Venue.id,
+    Venue.name,
+    Venue.upcoming_shows_count
+  )
 
-  formatted_venues = [{
-    'city': city[0],
-    'venues': get_venue_by_city(venues, city[0])
-  } for city in cities]
+  genres = request.args.getlist('genre')
+  if genres:
+    query = query.filter(Venue.genre_tags.any(Genre.name.in_(genres)))
 
-  return render_template('pages/venues.html', areas=formatted_venues);
+  rows = query.order_by(Venue.city, Venue.state, Venue.id).all()
 
-@app.route('/venues/search', methods=['POST'])
+  return render_template('pages/venues.html', areas=venue_areas(rows));
+
+@main.route('/venues/search', methods=['POST'])
+@query_budget(3)
 def search_venues():
   search = request.form.get('search_term', '')
 
   try:
-    selection = Venue.query.filter(
-      Venue.name.ilike('%{}%'.format(search))
-    ).all()
-
-    formatted_selection = list(map(lambda venue: {
-      'id': venue.id,
-      'name': venue.name,
-      'num_upcoming_shows': len(list(filter(lambda show: show.start_time > datetime.now(), venue.shows)))
-    }, selection))
-
-    formatted_data = {
-      'count': len(selection),
-      'data': formatted_selection,
-    }
-
-    return render_template('pages/search_venues.html', results=formatted_data, search_term=request.form.get('search_term', ''))
+    count, selection = search_catalog(Venue, search, current_app.config['SEARCH_RESULTS_LIMIT'])
+
+    return render_template('pages/search_venues.html', results=search_results(count, selection), search_term=request.form.get('search_term', ''))
   except:
     abort(422)
 
-@app.route('/venues/<int:venue_id>')
+@main.route('/venues/nearby')
+@query_budget(5)
+def nearby_venues():
+  try:
+    latitude = float(request.args['lat'])
+    longitude = float(request.args['lng'])
+    radius = float(request.args.get('radius', current_app.config['NEARBY_DEFAULT_RADIUS_KM']))
+  except (KeyError, ValueError):
+    abort(400)
+
+  if not (-90 <= latitude <= 90 and -180 <= longitude <= 180 and 0 < radius <= current_app.config['NEARBY_MAX_RADIUS_KM']):
+    abort(400)
+
+  # One query per circle searched: 5 up to NEARBY_MAX_RADIUS_KM
+  venues = venues_near(latitude, longitude, radius, current_app.config['NEARBY_RESULTS_LIMIT'])
+
+  return render_template('pages/nearby_venues.html', venues=venues, radius=radius)
+
+@main.route('/venues/<int:venue_id>')
+@query_budget(4)
+@conditional(lambda venue_id: detail_validators(Venue, Show.venue_id, Artist, Show.artist_id, venue_id))
+@page_cache.cached(venue_page)
 def show_venue(venue_id):
-  error_id = 500
+  venue = Venue.query.get(venue_id)
 
-  try:
-    venue = Venue.query.get(venue_id)
-    upcoming_shows = list(filter(lambda show: show.start_time > datetime.now(), venue.shows))
-    past_shows = list(filter(lambda show: show.start_time <= datetime.now(), venue.shows))
-
-    venue.upcoming_shows = list(map(lambda show: {
-    'artist_id': show.artist.id,
-    'artist_name': show.artist.name,
-    'artist_image_link': show.artist.image_link,
-    'start_time': show.start_time.strftime("%Y-%m-%dT%X"),
-    }, upcoming_shows))
-    venue.past_shows = list(map(lambda show: {
-      "artist_id": show.artist.id,
-      "artist_name": show.artist.name,
-      "artist_image_link": show.artist.image_link,
-      "start_time": show.start_time.strftime("%Y-%m-%dT%X"),
-    }, past_shows))
-
-    if venue is None:
-      error_id = 404
-      abort(error_id)
-
-    return render_template('pages/show_venue.html', venue=venue)
+  if venue is None:
+    abort(404)
 
-  except:
-    abort(error_id)
+  upcoming_shows, past_shows = split_shows(ArtistShow, artist_shows(venue_id), datetime.now())
+
+  return render_template('pages/show_venue.html', venue=venue, upcoming_shows=upcoming_shows, past_shows=past_shows)
 
 
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@main.route('/venues/create', methods=['GET'])
+@query_budget(0)
 def create_venue_form():
+  from forms import VenueForm
   form = VenueForm()
   return render_template('forms/new_venue.html', form=form)
 
-@app.route('/venues/create', methods=['POST'])
+@main.route('/venues/create', methods=['POST'])
+@query_budget(4)
 def create_venue_submission():
   error = False
   data = request.form
@@ -157,7 +250,6 @@ def create_venue_submission():
     phone = data['phone']
     image_link = data['image_link']
     facebook_link = data['facebook_link']
-    genres = ','.join(data.getlist('genres'))
     website_link = data['website_link']
     seeking_talent = 'seeking_talent' in data
     seeking_description = data['seeking_description']
@@ -170,14 +262,18 @@ def create_venue_submission():
       phone = phone, 
       image_link = image_link, 
       facebook_link = facebook_link, 
-      genres = genres, 
       website = website_link, 
       seeking_talent = seeking_talent, 
       seeking_description = seeking_description
     )
+    set_genres(venue, data.getlist('genres'))
 
     db.session.add(venue)
+    db.session.flush()
+    tile = EntityTile(venue.id, name, image_link)
     db.session.commit()
+    page_cache.invalidate(INDEX_PAGE, VENUES_PAGE)
+    recent_feed.listed('venues', tile)
   except:
     error = True
     db.session.rollback()
@@ -190,170 +286,82 @@ def create_venue_submission():
   else:
     flash('Venue ' + request.form['name'] + ' was successfully listed!')
 
-  return render_template('pages/home.html')
+  return home_page()
 
-@app.route('/venues/<int:venue_id>/delete', methods=['POST'])
+@main.route('/venues/<int:venue_id>/delete', methods=['POST'])
+@query_budget(4)
 def delete_venue(venue_id):
-  print(venue_id)
-
   venue = Venue.query.get(venue_id)
 
   if venue is None:
     abort(404)
 
   try:
+    artist_ids = [artist_id for (artist_id,) in db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()]
+
     db.session.delete(venue)
+    db.session.flush()
+    refresh_counters(Artist, Show.artist_id, Artist.id.in_(artist_ids), datetime.now())
     db.session.commit()
+    page_cache.invalidate(INDEX_PAGE, VENUES_PAGE, venue_page(venue_id), *map(artist_page, artist_ids))
+    recent_feed.removed('venues', venue_id)
   except:
     print(sys.exc_info())
     db.session.rollback()
     abort(422)
   
   flash('Venue was successfully deleted.')
-  return render_template('pages/home.html')
+  return home_page()
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@main.route('/artists')
+@query_budget(2)
+@conditional(lambda: listing_validators(Artist))
+@page_cache.cached(lambda: ARTISTS_PAGE)
 def artists():
-  artists = db.session.query(Artist).with_entities(Artist.id, Artist.name).order_by(Artist.id).all()
-  formatted_response = [{'id': artist[0], 'name': artist[1]} for artist in artists]
-  
-  return render_template('pages/artists.html', artists=formatted_response)
+  artists = db.session.query(Artist).with_entities(Artist.id, Artist.name)
 
-@app.route('/artists/search', methods=['POST'])
+  genres = request.args.getlist('genre')
+  if genres:
+    artists = artists.filter(Artist.genre_tags.any(Genre.name.in_(genres)))
+
+  artists = read(EntityLink, artists.order_by(Artist.id))
+
+  return render_template('pages/artists.html', artists=artists)
+
+@main.route('/artists/search', methods=['POST'])
+@query_budget(3)
 def search_artists():
   search = request.form.get('search_term', '')
 
-  response={
-    "count": 1,
-    "data": [{
-      "id": 4,
-      "name": "Guns N Petals",
-      "num_upcoming_shows": 0,
-    }]
-  }
-
   try:
-    selection = Artist.query.filter(
-      Artist.name.ilike('%{}%'.format(search))
-    ).all()
-
-    formatted_selection = list(map(lambda artist: {
-      'id': artist.id,
-      'name': artist.name,
-      'num_upcoming_shows': len(list(filter(lambda show: show.start_time > datetime.now(), artist.shows)))
-    }, selection))
-    
-    # print(upcoming_shows)
-    formatted_data = {
-      'count': len(selection),
-      'data': formatted_selection,
-    }
-
-    print(formatted_data)
-
-    return render_template('pages/search_artists.html', results=formatted_data, search_term=request.form.get('search_term', ''))
+    count, selection = search_catalog(Artist, search, current_app.config['SEARCH_RESULTS_LIMIT'])
+
+    return render_template('pages/search_artists.html', results=search_results(count, selection), search_term=request.form.get('search_term', ''))
   except:
     abort(422)
 
-@app.route('/artists/<int:artist_id>')
+@main.route('/artists/<int:artist_id>')
+@query_budget(4)
+@conditional(lambda artist_id: detail_validators(Artist, Show.artist_id, Venue, Show.venue_id, artist_id))
+@page_cache.cached(artist_page)
 def show_artist(artist_id):
   artist = Artist.query.get(artist_id)
-  upcoming_shows = list(filter(lambda show: show.start_time > datetime.now(), artist.shows))
-  past_shows = list(filter(lambda show: show.start_time <= datetime.now(), artist.shows))
-
-  artist.upcoming_shows = list(map(lambda show: {
-    'venue_id': show.venue.id,
-    'venue_name': show.venue.name,
-    'venue_image_link': show.venue.image_link,
-    'start_time': show.start_time.strftime("%Y-%m-%dT%X"),
-  }, upcoming_shows))
-  artist.past_shows = list(map(lambda show: {
-      "venue_id": show.venue.id,
-      "venue_name": show.venue.name,
-      "venue_image_link": show.venue.image_link,
-      "start_time": show.start_time.strftime("%Y-%m-%dT%X"),
-    }, past_shows))
-
-  data1={
-    "id": 4,
-    "name": "Guns N Petals",
-    "genres": ["Rock n Roll"],
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "326-123-5000",
-    "website": "https://www.gunsnpetalsband.com",
-    "facebook_link": "https://www.facebook.com/GunsNPetals",
-    "seeking_venue": True,
-    "seeking_description": "Looking for shows to perform at in the San Francisco Bay Area!",
-    "image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-    "past_shows": [{
-      "venue_id": 1,
-      "venue_name": "The Musical Hop",
-      "venue_image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60",
-      "start_time": "2019-05-21T21:30:00.000Z"
-    }],
-    "upcoming_shows": [],
-    "past_shows_count": 1,
-    "upcoming_shows_count": 0,
-  }
-  data2={
-    "id": 5,
-    "name": "Matt Quevedo",
-    "genres": ["Jazz"],
-    "city": "New York",
-    "state": "NY",
-    "phone": "300-400-5000",
-    "facebook_link": "https://www.facebook.com/mattquevedo923251523",
-    "seeking_venue": False,
-    "image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
-    "past_shows": [{
-      "venue_id": 3,
-      "venue_name": "Park Square Live Music & Coffee",
-      "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-      "start_time": "2019-06-15T23:00:00.000Z"
-    }],
-    "upcoming_shows": [],
-    "past_shows_count": 1,
-    "upcoming_shows_count": 0,
-  }
-  data3={
-    "id": 6,
-    "name": "The Wild Sax Band",
-    "genres": ["Jazz", "Classical"],
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "432-325-5432",
-    "seeking_venue": False,
-    "image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    "past_shows": [],
-    "upcoming_shows": [{
-      "venue_id": 3,
-      "venue_name": "Park Square Live Music & Coffee",
-      "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-      "start_time": "2035-04-01T20:00:00.000Z"
-    }, {
-      "venue_id": 3,
-      "venue_name": "Park Square Live Music & Coffee",
-      "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-      "start_time": "2035-04-08T20:00:00.000Z"
-    }, {
-      "venue_id": 3,
-      "venue_name": "Park Square Live Music & Coffee",
-      "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-      "start_time": "2035-04-15T20:00:00.000Z"
-    }],
-    "past_shows_count": 0,
-    "upcoming_shows_count": 3,
-  }
-  # data = list(filter(lambda d: d['id'] == artist_id, [data1, data2, data3]))[0]
-  return render_template('pages/show_artist.html', artist=artist)
+
+  if artist is None:
+    abort(404)
+
+  upcoming_shows, past_shows = split_shows(VenueShow, venue_shows(artist_id), datetime.now())
+
+  return render_template('pages/show_artist.html', artist=artist, upcoming_shows=upcoming_shows, past_shows=past_shows)
 
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@main.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@query_budget(1)
 def edit_artist(artist_id):
+  from forms import ArtistForm
   form = ArtistForm()
   artist = Artist.query.get(artist_id)
 
@@ -362,7 +370,8 @@ def edit_artist(artist_id):
 
   return render_template('forms/edit_artist.html', form=form, artist=artist)
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@main.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@query_budget(8)
 def edit_artist_submission(artist_id):
   error = False
   data = request.form
@@ -371,12 +380,15 @@ def edit_artist_submission(artist_id):
   if artist is None:
     abort(404)
 
+  name = artist.name
   try:
+    venue_ids = [venue_id for (venue_id,) in db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()]
+
     artist.name = data['name']
     artist.city = data['city']
     artist.state = data['state']
     artist.phone = data['phone']
-    artist.genres = ','.join(data.getlist('genres'))
+    set_genres(artist, data.getlist('genres'))
     artist.facebook_link = data['facebook_link']
     artist.image_link = data['image_link']
     artist.website_link = data['website_link']
@@ -384,20 +396,25 @@ def edit_artist_submission(artist_id):
     artist.seeking_description = data['seeking_description']
 
     db.session.commit()
+    page_cache.invalidate(INDEX_PAGE, ARTISTS_PAGE, artist_page(artist_id), *map(venue_page, venue_ids))
+    recent_feed.updated('artists', EntityTile(artist_id, data['name'], data['image_link']))
   except:
     error = True
     db.session.rollback()
     print(sys.exc_info())
 
+  # Named from the request, as the artist expired at commit
   if error:
-    flash('An error occures. Couldn\'t update' + artist.name + '!')
+    flash('An error occures. Couldn\'t update' + name + '!')
   else:
-    flash(artist.name + ' was successfully updated!')
+    flash(data['name'] + ' was successfully updated!')
 
-  return redirect(url_for('show_artist', artist_id=artist_id))
+  return redirect(url_for('main.show_artist', artist_id=artist_id))
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@main.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@query_budget(1)
 def edit_venue(venue_id):
+  from forms import VenueForm
   form = VenueForm()
   venue = Venue.query.get(venue_id)
 
@@ -406,7 +423,8 @@ def edit_venue(venue_id):
 
   return render_template('forms/edit_venue.html', form=form, venue=venue)
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@main.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@query_budget(8)
 def edit_venue_submission(venue_id):
   error = False
   data = request.form
@@ -415,12 +433,20 @@ def edit_venue_submission(venue_id):
   if venue is None:
     abort(404)
 
+  name = venue.name
   try:
+    artist_ids = [artist_id for (artist_id,) in db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()]
+
+    if (venue.address, venue.city, venue.state) != (data['address'], data['city'], data['state']):
+      # Left for geocode-venues to locate again
+      venue.latitude = venue.longitude = venue.geohash = None
+
     venue.name = data['name']
+    venue.address = data['address']
     venue.city = data['city']
     venue.state = data['state']
     venue.phone = data['phone']
-    venue.genres = ','.join(data.getlist('genres'))
+    set_genres(venue, data.getlist('genres'))
     venue.facebook_link = data['facebook_link']
     venue.image_link = data['image_link']
     venue.website = data['website_link']
@@ -428,28 +454,35 @@ def edit_venue_submission(venue_id):
     venue.seeking_description = data['seeking_description']
 
     db.session.commit()
+    page_cache.invalidate(INDEX_PAGE, VENUES_PAGE, venue_page(venue_id), *map(artist_page, artist_ids))
+    recent_feed.updated('venues', EntityTile(venue_id, data['name'], data['image_link']))
   except:
     error = True
     db.session.rollback()
     print(sys.exc_info())
 
+  # Named from the request, as the venue expired at commit
   if error:
-    flash('An error occures. Couldn\'t update' + venue.name + '!')
+    flash('An error occures. Couldn\'t update' + name + '!')
   else:
-    flash(venue.name + ' was successfully updated!')
+    flash(data['name'] + ' was successfully updated!')
 
-  return redirect(url_for('show_venue', venue_id=venue_id))
+  return redirect(url_for('main.show_venue', venue_id=venue_id))
 
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@main.route('/artists/create', methods=['GET'])
+@query_budget(0)
 def create_artist_form():
+  from forms import ArtistForm
   form = ArtistForm()
   return render_template('forms/new_artist.html', form=form)
 
-@app.route('/artists/create', methods=['POST'])
+@main.route('/artists/create', methods=['POST'])
+@query_budget(4)
 def create_artist_submission():
+  from forms import ArtistForm
   error = False
   form = ArtistForm()
   data = request.form
@@ -459,7 +492,6 @@ def create_artist_submission():
     city = data['city']
     state = data['state']
     phone = data['phone']
-    genres = ','.join(data.getlist('genres'))
     facebook_link = data['facebook_link']
     image_link = data['image_link']
     website_link = data['website_link']
@@ -470,16 +502,20 @@ def create_artist_submission():
       city=city,
       state=state,
       phone=phone,
-      genres=genres,
       facebook_link=facebook_link,
       image_link=image_link,
       website_link=website_link,
       seeking_venue=seeking_venue,
       seeking_description=seeking_description
     )
+    set_genres(artist, data.getlist('genres'))
 
     db.session.add(artist)
+    db.session.flush()
+    tile = EntityTile(artist.id, name, image_link)
     db.session.commit()
+    page_cache.invalidate(INDEX_PAGE, ARTISTS_PAGE)
+    recent_feed.listed('artists', tile)
   except:
     error = True
     db.session.rollback()
@@ -497,91 +533,83 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@main.route('/shows')
+@query_budget(2)
+@conditional(shows_validators)
 def shows():
-  shows = Show.query.all()
-
-  formatted_data = [
-    {
-      'venue_id': show.venue.id,
-      'venue_name': show.venue.name,
-      'artist_id': show.artist.id,
-      'artist_name': show.artist.name,
-      'artist_image_link': show.artist.image_link,
-      'start_time': show.start_time.strftime("%Y-%m-%dT%X"),
-    } for show in shows 
-  ]
-
-  data=[{
-    "venue_id": 1,
-    "venue_name": "The Musical Hop",
-    "artist_id": 4,
-    "artist_name": "Guns N Petals",
-    "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-    "start_time": "2019-05-21T21:30:00.000Z"
-  }, {
-    "venue_id": 3,
-    "venue_name": "Park Square Live Music & Coffee",
-    "artist_id": 5,
-    "artist_name": "Matt Quevedo",
-    "artist_image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
-    "start_time": "2019-06-15T23:00:00.000Z"
-  }, {
-    "venue_id": 3,
-    "venue_name": "Park Square Live Music & Coffee",
-    "artist_id": 6,
-    "artist_name": "The Wild Sax Band",
-    "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    "start_time": "2035-04-01T20:00:00.000Z"
-  }, {
-    "venue_id": 3,
-    "venue_name": "Park Square Live Music & Coffee",
-    "artist_id": 6,
-    "artist_name": "The Wild Sax Band",
-    "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    "start_time": "2035-04-08T20:00:00.000Z"
-  }, {
-    "venue_id": 3,
-    "venue_name": "Park Square Live Music & Coffee",
-    "artist_id": 6,
-    "artist_name": "The Wild Sax Band",
-    "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    "start_time": "2035-04-15T20:00:00.000Z"
-  }]
-  return render_template('pages/shows.html', shows=formatted_data)
-
-@app.route('/shows/create')
+  cursor = request.args.get('cursor')
+  page_size = current_app.config['SHOWS_PER_PAGE']
+
+  query = db.session.query(
+    Show.id,
+    Show.start_time,
+    Venue.id,
+    Venue.name,
+    Artist.id,
+    Artist.name,
+    Artist.image_link
+  ).join(Venue, Show.venue_id == Venue.id
+  ).join(Artist, Show.artist_id == Artist.id)
+
+  if cursor:
+    try:
+      query = after_show(query, cursor)
+    except ValueError:
+      abort(400)
+
+  rows = query.order_by(Show.start_time, Show.id).limit(page_size + 1).all()
+  rows, next_cursor = take_page(rows, page_size, lambda row: show_cursor(row[1], row[0]))
+
+  shows = (
+    ShowListing(venue_id, venue_name, artist_id, artist_name, artist_image_link, start_time)
+    for show_id, start_time, venue_id, venue_name, artist_id, artist_name, artist_image_link in rows
+  )
+
+  return stream_template('pages/shows.html', shows=shows, next_cursor=next_cursor)
+
+@main.route('/shows/create')
+@query_budget(0)
 def create_shows():
   # renders form. do not touch.
+  from forms import ShowForm
   form = ShowForm()
   return render_template('forms/new_show.html', form=form)
 
-@app.route('/shows/create', methods=['POST'])
+@main.route('/shows/create', methods=['POST'])
+@query_budget(3)
 def create_show_submission():
+  import dateutil.parser
   error = False
+  double_booked = False
+  show_id = None
   data = request.form
 
   try:
-    artist_id = data['artist_id']
-    venue_id = data['venue_id']
-    start_time = data['start_time']
+    booking = Booking(
+      artist_id = int(data['artist_id']),
+      venue_id = int(data['venue_id']),
+      start_time = dateutil.parser.parse(data['start_time']),
+    )
+  except (KeyError, ValueError, OverflowError):
+    booking = None
 
-    artist = Artist.query.get(artist_id)
-    venue = Venue.query.get(venue_id)
+  # Show times are stored as local times, as in read_bookings of the API
+  if booking is None or booking.start_time.tzinfo is not None:
+    flash('Enter an artist ID, a venue ID and a start time without a UTC offset. Show could not be listed.')
+    return home_page()
 
-    if artist is None or venue is None:
-      error = True
+  try:
+    # No row is inserted when the artist or the venue does not exist
+    show_id = db.session.scalar(insert_show(booking))
+    if show_id is None:
       db.session.rollback()
-      abort()
-
-    show = Show(
-      artist_id = artist_id,
-      venue_id = venue_id,
-      start_time = start_time,
-    )
-
-    db.session.add(show)
-    db.session.commit()
+    else:
+      show_added(booking, datetime.now())
+      db.session.commit()
+      page_cache.invalidate(VENUES_PAGE, venue_page(booking.venue_id), artist_page(booking.artist_id))
+  except IntegrityError:
+    double_booked = True
+    db.session.rollback()
   except:
     error = True
     db.session.rollback()
@@ -589,43 +617,138 @@ def create_show_submission():
   finally:
     db.session.close()
 
-  if error:
+  if double_booked:
+    flash('The artist or the venue already has a show at that time. Show could not be listed.')
+  elif error:
     flash('An error occurred. Show could not be listed.')
-    return render_template('pages/home.html')
+  elif show_id is None:
+    flash('There is no artist or no venue with that ID. Show could not be listed.')
   else:
     flash('Show was successfully listed!')
-    return render_template('pages/home.html')
+  return home_page()
 
-@app.errorhandler(404)
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@click.command('rollover-shows')
+@with_appcontext
+def rollover_shows():
+  """Move started shows from the upcoming to the past show counters."""
+  refreshed = rollover(datetime.now())
+  db.session.commit()
+  print('Refreshed show counters of {} venues and artists.'.format(refreshed))
+
+@click.command('export')
+@click.argument('kind', type=click.Choice(sorted(EXPORTS)))
+@click.option('--format', 'fmt', type=click.Choice(sorted(EXPORT_MIMETYPES)), default='ndjson', show_default=True)
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='Output file. Defaults to stdout.')
+@click.option('--gzip', 'compress', is_flag=True, help='Compress the output with gzip.')
+@click.option('--watermark', type=click.Path(dir_okay=False),
+  help='File holding the watermark of the last export. Only rows updated since are exported, and the file is advanced afterwards.')
+@with_appcontext
+def export_catalog(kind, fmt, output, compress, watermark):
+  """Stream venues, artists or shows as NDJSON or CSV.
+
+  Incremental exports overlap by EXPORT_WATERMARK_OVERLAP seconds and never
+  include deleted rows; see api.export_watermark.
+  """
+  model = EXPORTS[kind]
+  since = None
+  if watermark and os.path.exists(watermark):
+    with open(watermark) as f:
+      since = datetime.fromisoformat(f.read().strip())
+
+  until, next_since = export_watermark(model)
+  chunks = export_chunks(model, fmt, since, until)
+  if compress:
+    chunks = gzipped(chunks)
+
+  with click.open_file(output or '-', 'wb') as out:
+    for chunk in chunks:
+      out.write(chunk)
+
+  if watermark and next_since is not None:
+    with open(watermark + '.tmp', 'w') as f:
+      f.write(next_since.isoformat())
+    os.replace(watermark + '.tmp', watermark)
+
+@main.route('/cache/stats')
+@query_budget(0)
+def cache_stats():
+  return jsonify(page_cache.stats())
+
+@main.route('/metrics')
+@query_budget(0)
+def metrics():
+  return Response(pool_metrics(db.engine.pool), mimetype='text/plain; version=0.0.4')
+
+@main.app_errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
-@app.errorhandler(500)
+@main.app_errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
+#----------------------------------------------------------------------------#
+# App Factory.
+#----------------------------------------------------------------------------#
+
+def running_flask_command():
+  ctx = click.get_current_context(silent=True)
+  return ctx is not None and ctx.find_object(ScriptInfo) is not None
+
+def create_app(config=None):
+  """Build the app from config.py, with config (a mapping) overriding it.
+
+  The schema is managed by the migrations only: run `flask --app app db
+  upgrade` before serving.
+  """
+  app = Flask(__name__)
+  app.config.from_object('config')
+  app.config.from_mapping(config or {})
+
+  setup_db(app)
+  setup_cache(app)
+  setup_feed(app, page_cache.backend)
+  setup_instrumentation(app)
+  app.register_blueprint(main)
+  app.register_blueprint(api)
+
+  if running_flask_command():
+    from flask_migrate import Migrate
+    from importer import import_catalog
+    from geocoding import geocode_venues
+
+    Migrate(app, db)
+    for command in (rollover_shows, import_catalog, export_catalog, geocode_venues):
+      app.cli.add_command(command)
+
+  if not app.debug:
     file_handler = FileHandler('error.log')
     file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+      Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
     )
     app.logger.setLevel(logging.INFO)
     file_handler.setLevel(logging.INFO)
     app.logger.addHandler(file_handler)
     app.logger.info('errors')
 
+  return app
+
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
@@ -0,0 +1,171 @@
+"""ASGI entry point serving the read routes on asyncio.
+
+Listings, detail pages and search run on an asyncpg engine and render the
+same templates as the Flask views. Every other route, and any request
+carrying a Flask session cookie (flashed messages, read-your-writes), is
+passed through to the Flask app.
+
+    uvicorn asgi:application --workers 4
+"""
+from contextlib import asynccontextmanager
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from a2wsgi import WSGIMiddleware
+from flask import render_template
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, Response
+from starlette.routing import Mount, Route
+
+from app import create_app, venue_areas, search_results
+from feed import recent_feed
+from listings import EntityLink, ArtistShow, VenueShow, artist_shows, venue_shows, split_statements, read
+from models import Venue, Artist, Genre
+from pool import async_engine_options
+from search import search_catalog_async
+
+flask_app = create_app()
+
+engine = create_async_engine(
+    make_url(flask_app.config['SQLALCHEMY_DATABASE_URI']).set(drivername='postgresql+asyncpg'),
+    **async_engine_options(flask_app.config)
+)
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+flask = WSGIMiddleware(flask_app)
+
+
+class ReadRoute:
+    """ASGI app running view(request) unless Flask has to handle the request."""
+
+    def __init__(self, view):
+        self.view = view
+
+    async def __call__(self, scope, receive, send):
+        request = Request(scope, receive)
+        if flask_app.config['SESSION_COOKIE_NAME'] in request.cookies:
+            await flask(scope, receive, send)
+            return
+
+        response = await self.view(request)
+        await response(scope, receive, send)
+
+
+def render(request, template, status=200, **context):
+    """Render a Flask template, with url_for and request bound to request."""
+    with flask_app.test_request_context(request.url.path, method=request.method, query_string=request.url.query):
+        return HTMLResponse(render_template(template, **context), status_code=status)
+
+async def search_term(request):
+    form = parse_qs((await request.body()).decode('utf-8'))
+    return form.get('search_term', [''])[0]
+
+async def split_shows(session, model, query, now):
+    upcoming_shows, past_shows = split_statements(query, now)
+
+    return read(model, await session.execute(upcoming_shows)), read(model, await session.execute(past_shows))
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+async def index(request):
+    feed = recent_feed.loaded()
+    if feed is None:
+        async with Session() as session:
+            feed = recent_feed.publish({kind: (await session.execute(query)).all() for kind, query in recent_feed.queries().items()})
+
+    return render(request, 'pages/home.html', **feed)
+
+async def venues(request):
+    query = select(Venue.city, Venue.state, Venue.id, Venue.name, Venue.upcoming_shows_count)
+
+    genres = request.query_params.getlist('genre')
+    if genres:
+        query = query.where(Venue.genre_tags.any(Genre.name.in_(genres)))
+
+    async with Session() as session:
+        rows = (await session.execute(query.order_by(Venue.city, Venue.state, Venue.id))).all()
+
+    return render(request, 'pages/venues.html', areas=venue_areas(rows))
+
+async def search_venues(request):
+    search = await search_term(request)
+
+    try:
+        async with Session() as session:
+            count, selection = await search_catalog_async(session, Venue, search, flask_app.config['SEARCH_RESULTS_LIMIT'])
+    except Exception:
+        return Response(status_code=422)
+
+    return render(request, 'pages/search_venues.html', results=search_results(count, selection), search_term=search)
+
+async def show_venue(request):
+    venue_id = request.path_params['venue_id']
+
+    async with Session() as session:
+        venue = await session.get(Venue, venue_id)
+        if venue is None:
+            return render(request, 'errors/404.html', 404)
+
+        upcoming_shows, past_shows = await split_shows(session, ArtistShow, artist_shows(venue_id), datetime.now())
+
+    return render(request, 'pages/show_venue.html', venue=venue, upcoming_shows=upcoming_shows, past_shows=past_shows)
+
+async def artists(request):
+    query = select(Artist.id, Artist.name)
+
+    genres = request.query_params.getlist('genre')
+    if genres:
+        query = query.where(Artist.genre_tags.any(Genre.name.in_(genres)))
+
+    async with Session() as session:
+        rows = (await session.execute(query.order_by(Artist.id))).all()
+
+    return render(request, 'pages/artists.html', artists=read(EntityLink, rows))
+
+async def search_artists(request):
+    search = await search_term(request)
+
+    try:
+        async with Session() as session:
+            count, selection = await search_catalog_async(session, Artist, search, flask_app.config['SEARCH_RESULTS_LIMIT'])
+    except Exception:
+        return Response(status_code=422)
+
+    return render(request, 'pages/search_artists.html', results=search_results(count, selection), search_term=search)
+
+async def show_artist(request):
+    artist_id = request.path_params['artist_id']
+
+    async with Session() as session:
+        artist = await session.get(Artist, artist_id)
+        if artist is None:
+            return render(request, 'errors/404.html', 404)
+
+        upcoming_shows, past_shows = await split_shows(session, VenueShow, venue_shows(artist_id), datetime.now())
+
+    return render(request, 'pages/show_artist.html', artist=artist, upcoming_shows=upcoming_shows, past_shows=past_shows)
+
+
+@asynccontextmanager
+async def lifespan(application):
+    yield
+    await engine.dispose()
+
+READ = ['GET', 'HEAD']
+
+application = Starlette(routes=[
+    Route('/', ReadRoute(index), methods=READ),
+    Route('/venues', ReadRoute(venues), methods=READ),
+    Route('/venues/search', ReadRoute(search_venues), methods=['POST']),
+    Route('/venues/{venue_id:int}', ReadRoute(show_venue), methods=READ),
+    Route('/artists', ReadRoute(artists), methods=READ),
+    Route('/artists/search', ReadRoute(search_artists), methods=['POST']),
+    Route('/artists/{artist_id:int}', ReadRoute(show_artist), methods=READ),
+    Mount('/', app=flask),
+], lifespan=lifespan)
@@ -0,0 +1,45 @@
+"""Bytes and latency of the /api/v1 JSON routes against their HTML pages.
+
+Usage: python benchmarks/api_vs_html.py [venues]
+"""
+import statistics
+import sys
+
+from common import QueryCounter, load_app, reset_db, seed, timed
+
+PAIRS = [
+    ('/venues', '/api/v1/venues?fields=name,city,state&limit=1000'),
+    ('/artists', '/api/v1/artists?fields=name&limit=1000'),
+    ('/shows', '/api/v1/shows?fields=start_time,venue_id,venue_name,artist_id,artist_name,artist_image_link&limit=60'),
+    ('/venues/42', '/api/v1/venues/42'),
+]
+
+
+def measure(client, engine, path):
+    with QueryCounter(engine) as counter:
+        response = client.get(path)
+        size = len(response.get_data())
+    assert response.status_code == 200, path
+
+    durations = timed(lambda: client.get(path).get_data(), repeat=10)
+    return size, counter.count, statistics.median(durations)
+
+
+def main(venues):
+    app = load_app()
+    from models import db
+
+    with app.app_context():
+        reset_db(db)
+        seed(db, venues=venues, artists=venues)
+        engine = db.engine
+
+    client = app.test_client()
+    print('%-98s %10s %8s %10s' % ('route', 'bytes', 'queries', 'median ms'))
+    for html, json in PAIRS:
+        for path in (html, json):
+            print('%-98s %10d %8d %10.1f' % ((path,) + measure(client, engine, path)))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
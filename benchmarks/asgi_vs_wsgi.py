@@ -0,0 +1,107 @@
+"""Requests/sec and latency of the read routes, served by asgi.py on uvicorn
+(asyncpg) against the Flask app on its WSGI development server, each in a
+single worker process.
+
+Needs PostgreSQL (BENCH_DATABASE_URL) and uvicorn. The page cache is
+disabled in both servers.
+
+Usage: python benchmarks/asgi_vs_wsgi.py [venues] [concurrency] [seconds]
+"""
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from common import DATABASE_URL, ROOT, load_app, reset_db, seed
+
+ROUTES = ['/', '/venues', '/venues/42', '/artists', '/artists/42']
+
+SERVERS = [
+    ('wsgi', [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', '{port}', '--with-threads']),
+    ('asgi', [sys.executable, '-m', 'uvicorn', 'asgi:application', '--port', '{port}', '--workers', '1',
+              '--log-level', 'warning']),
+]
+
+
+async def fetch(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write('GET {} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'.format(path).encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    await reader.read()
+    writer.close()
+    return status
+
+
+async def load(port, path, concurrency, seconds):
+    """Keep concurrency requests in flight for seconds; return latencies in ms."""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                ok = await fetch(port, path) == 200
+            except OSError:
+                ok = False
+            if ok:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors += 1
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, errors
+
+
+def wait_for(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if asyncio.run(fetch(port, '/')) == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('server on port %d did not start' % port)
+
+
+def percentile(values, fraction):
+    return sorted(values)[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main(venues, concurrency, seconds):
+    if not DATABASE_URL.startswith('postgresql'):
+        sys.exit('asgi.py needs PostgreSQL: set BENCH_DATABASE_URL')
+
+    app = load_app()
+    from models import db
+
+    with app.app_context():
+        reset_db(db)
+        seed(db, venues=venues, artists=venues)
+
+    env = dict(os.environ, DATABASE_URL=DATABASE_URL, CACHE_TTL='0')
+    print('%-8s %-14s %10s %10s %10s %8s' % ('server', 'route', 'req/s', 'p50 ms', 'p99 ms', 'errors'))
+
+    for port, (name, command) in enumerate(SERVERS, start=8701):
+        server = subprocess.Popen([arg.format(port=port) for arg in command], cwd=ROOT, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for(port)
+            for path in ROUTES:
+                latencies, errors = asyncio.run(load(port, path, concurrency, seconds))
+                print('%-8s %-14s %10.1f %10.1f %10.1f %8d' % (
+                    name, path, len(latencies) / seconds,
+                    statistics.median(latencies), percentile(latencies, 0.99), errors))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [1000, 32, 10][len(args):]))
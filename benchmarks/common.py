@@ -0,0 +1,116 @@
+"""Shared helpers for the benchmark scripts.
+
+Benchmarks run against BENCH_DATABASE_URL (a throwaway SQLite file by
+default) so they never touch the database configured in config.py.
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert, literal
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DATABASE_URL = os.getenv(
+    'BENCH_DATABASE_URL', 'sqlite:///' + os.path.join(ROOT, 'bench.db')
+)
+
+
+
+# SQLite fallback: store search vectors as plain text so the schema can be
+# created. The search endpoints themselves need PostgreSQL.
+@compiles(TSVECTOR, 'sqlite')
+def compile_tsvector(element, compiler, **kw):
+    return 'TEXT'
+
+
+@event.listens_for(Engine, 'connect')
+def register_sqlite_functions(dbapi_connection, connection_record):
+    if DATABASE_URL.startswith('sqlite'):
+        dbapi_connection.create_function(
+            'to_tsvector', 2, lambda config, document: document.lower(),
+            deterministic=True)
+
+
+def load_app():
+    from app import create_app
+
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': DATABASE_URL,
+        # Measure the work behind each page, not the rendered page cache.
+        'CACHE_TTL': 0,
+        'TESTING': True,
+    })
+
+
+class QueryCounter:
+    """Counts statements sent to the engine while active."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+def reset_db(db):
+    db.drop_all()
+    db.create_all()
+
+
+def seed(db, venues, artists=100, shows_per_venue=5):
+    from counters import COUNTED, refresh_counters
+    from models import Venue, Artist, Show
+
+    now = datetime.now()
+    cities = [('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'),
+              ('Chicago', 'IL'), ('Seattle', 'WA')]
+
+    db.session.execute(insert(Artist), [{
+        'name': 'Artist %d' % i,
+        'city': cities[i % len(cities)][0],
+        'state': cities[i % len(cities)][1],
+        'genres': 'Jazz,Rock n Roll',
+        'seeking_venue': False,
+    } for i in range(artists)])
+    db.session.execute(insert(Venue), [{
+        'name': 'Venue %d' % i,
+        'city': cities[i % len(cities)][0],
+        'state': cities[i % len(cities)][1],
+        'address': '%d Main St' % i,
+        'genres': 'Jazz,Rock n Roll',
+        'seeking_talent': False,
+    } for i in range(venues)])
+    db.session.execute(insert(Show), [{
+        'venue_id': venue_id + 1,
+        'artist_id': (venue_id + n) % artists + 1,
+        # Distinct per venue, so no artist plays two venues at the same time
+        'start_time': now + timedelta(days=(n - shows_per_venue // 2) * 7, hours=venue_id % 24, minutes=venue_id // 24),
+    } for venue_id in range(venues) for n in range(shows_per_venue)])
+    for model, show_fk in COUNTED:
+        refresh_counters(model, show_fk, literal(True), now)
+    db.session.commit()
+
+
+def timed(fn, repeat=5):
+    """Run fn repeat times and return the durations in milliseconds."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
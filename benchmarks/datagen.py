@@ -0,0 +1,137 @@
+"""Synthetic venues, artists and shows at a configurable scale.
+
+Unlike common.seed, the data is shaped like a real catalogue: a few large
+cities hold most venues, genres vary per row, and popular artists and
+venues get most of the shows, half of them in the past. The same seed
+always generates the same rows.
+
+Usage: python benchmarks/datagen.py [venues] [artists] [shows] [seed]
+"""
+import random
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, literal
+
+from common import load_app, reset_db
+from forms import GENRES
+from geo import encode
+from geocoding import FixtureGeocoder
+
+CITIES = [
+    ('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('Houston', 'TX'),
+    ('Phoenix', 'AZ'), ('Philadelphia', 'PA'), ('San Antonio', 'TX'), ('San Diego', 'CA'),
+    ('Dallas', 'TX'), ('Austin', 'TX'), ('San Francisco', 'CA'), ('Seattle', 'WA'),
+    ('Denver', 'CO'), ('Nashville', 'TN'), ('Portland', 'OR'), ('New Orleans', 'LA'),
+    ('Boston', 'MA'), ('Detroit', 'MI'), ('Memphis', 'TN'), ('Atlanta', 'GA'),
+]
+WORDS = [
+    'Blue', 'Red', 'Velvet', 'Golden', 'Electric', 'Silver', 'Midnight', 'Crystal',
+    'Rusty', 'Wild', 'Lucky', 'Hollow', 'Neon', 'Old', 'Royal', 'Little',
+]
+VENUE_NOUNS = ['Hall', 'Room', 'Lounge', 'Tavern', 'Club', 'Theatre', 'Garage', 'Cellar', 'Barn', 'Stage']
+ARTIST_NOUNS = ['Band', 'Quartet', 'Collective', 'Trio', 'Orchestra', 'Brothers', 'Sisters', 'Project']
+
+BATCH_SIZE = 5000
+
+
+def zipf_weights(n, exponent=1.1):
+    return [1 / (rank ** exponent) for rank in range(1, n + 1)]
+
+
+def batches(rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        yield rows[start:start + BATCH_SIZE]
+
+
+def entity_rows(rng, count, nouns, extra):
+    cities = rng.choices(CITIES, weights=zipf_weights(len(CITIES)), k=count)
+    rows = []
+    for i, (city, state) in enumerate(cities):
+        genres = rng.sample(GENRES, rng.choice((1, 1, 2, 2, 3)))
+        row = {
+            'name': '{} {} {}'.format(rng.choice(WORDS), rng.choice(nouns), i + 1),
+            'city': city,
+            'state': state,
+            'phone': '{:03d}-{:03d}-{:04d}'.format(rng.randrange(200, 999), rng.randrange(1000), rng.randrange(10000)),
+            'genres': ','.join(genres),
+            'image_link': 'https://picsum.photos/seed/{}/400'.format(rng.randrange(10 ** 6)),
+            'facebook_link': 'https://www.facebook.com/{}'.format(rng.randrange(10 ** 9)),
+            'seeking_description': 'Looking to book new acts.' if rng.random() < 0.3 else None,
+        }
+        row.update(extra(i))
+        rows.append(row)
+    return rows
+
+
+def insert_entities(db, model, genre_table, fk_name, rows, genre_ids):
+    for chunk in batches(rows):
+        ids = db.session.scalars(insert(model).returning(model.id, sort_by_parameter_order=True), chunk).all()
+        links = [
+            {fk_name: entity_id, 'genre_id': genre_ids[name]}
+            for entity_id, row in zip(ids, chunk) for name in row['genres'].split(',')
+        ]
+        db.session.execute(insert(genre_table), links)
+
+
+def generate(db, venues, artists, shows, seed=0):
+    """Insert the catalogue into an empty database and refresh the counters."""
+    from counters import COUNTED, refresh_counters
+    from models import Venue, Artist, Show, Genre, venue_genres, artist_genres
+
+    rng = random.Random(seed)
+    now = datetime.now()
+
+    genre_ids = dict(db.session.execute(
+        insert(Genre).returning(Genre.name, Genre.id), [{'name': name} for name in GENRES]
+    ).tuples().all())
+
+    venue_rows = entity_rows(rng, venues, VENUE_NOUNS, lambda i: {
+        'address': '{} {} St, Suite {}'.format(rng.randrange(1, 9999), rng.choice(WORDS), i + 1),
+        'website': 'https://venue{}.example.com'.format(i + 1),
+        'seeking_talent': rng.random() < 0.3,
+    })
+    # Located as `flask geocode-venues` would, with the default geocoder
+    geocoder = FixtureGeocoder()
+    for row in venue_rows:
+        latitude, longitude = geocoder.geocode(row['address'], row['city'], row['state'])
+        row.update(latitude=latitude, longitude=longitude, geohash=encode(latitude, longitude))
+    insert_entities(db, Venue, venue_genres, 'venue_id', venue_rows, genre_ids)
+    insert_entities(db, Artist, artist_genres, 'artist_id', entity_rows(rng, artists, ARTIST_NOUNS, lambda i: {
+        'website_link': 'https://artist{}.example.com'.format(i + 1),
+        'seeking_venue': rng.random() < 0.3,
+    }), genre_ids)
+
+    venue_ids = rng.choices(range(1, venues + 1), weights=zipf_weights(venues, 0.8), k=shows)
+    artist_ids = rng.choices(range(1, artists + 1), weights=zipf_weights(artists, 0.8), k=shows)
+    rows = []
+    taken = set()
+    for venue_id, artist_id in zip(venue_ids, artist_ids):
+        # A venue or an artist has at most one show at a time (see bookings.py)
+        while True:
+            start_time = now + timedelta(minutes=rng.randrange(-365 * 24 * 60, 365 * 24 * 60))
+            if ('venue', venue_id, start_time) not in taken and ('artist', artist_id, start_time) not in taken:
+                break
+        taken.update((('venue', venue_id, start_time), ('artist', artist_id, start_time)))
+        rows.append({'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time})
+    for chunk in batches(rows):
+        db.session.execute(insert(Show), chunk)
+
+    for model, show_fk in COUNTED:
+        refresh_counters(model, show_fk, literal(True), now)
+    db.session.commit()
+
+
+def main(venues, artists, shows, seed):
+    app = load_app()
+    from models import db
+
+    with app.app_context():
+        reset_db(db)
+        generate(db, venues, artists, shows, seed)
+    print('Generated {} venues, {} artists and {} shows.'.format(venues, artists, shows))
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [1000, 1000, 10000, 0][len(args):]))
@@ -0,0 +1,51 @@
+"""Cost of the `datetime` template filter per formatted show time.
+
+Compares the filter with the previous implementation, which formatted each
+start time to a string in the view, parsed it back with dateutil and
+formatted it with babel.dates.format_datetime.
+
+Usage: python benchmarks/datetime_filter.py [count]
+"""
+import statistics
+import sys
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from common import load_app, timed
+
+
+def previous_filter(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def main(count):
+    load_app()
+    from app import format_datetime
+
+    start = datetime(2030, 1, 1, 20, 0)
+    times = [start + timedelta(hours=7 * i, minutes=i % 60) for i in range(count)]
+
+    # Both filters must agree before their speed is worth comparing.
+    for value in times[:100]:
+        assert format_datetime(value, 'full') == previous_filter(value.strftime("%Y-%m-%dT%X"), 'full')
+
+    cases = [
+        ('previous (strftime + dateutil + babel)', lambda: [previous_filter(t.strftime("%Y-%m-%dT%X"), 'full') for t in times]),
+        ('filter on datetimes', lambda: [format_datetime(t, 'full') for t in times]),
+        ('filter on strings', lambda: [format_datetime(t.strftime("%Y-%m-%dT%X"), 'full') for t in times]),
+    ]
+    print('%-40s %12s %12s' % ('case', 'median ms', 'us per call'))
+    for name, run in cases:
+        median = statistics.median(timed(run, repeat=7))
+        print('%-40s %12.1f %12.2f' % (name, median, median * 1000 / count))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,91 @@
+"""Check that the hot queries issued by app.py are served from indexes.
+
+Drives each route through the test client, re-runs every statement it
+issued under EXPLAIN and fails if the plan sequentially scans a table the
+route is expected to reach through an index.
+
+Needs PostgreSQL: BENCH_DATABASE_URL=postgresql://... python benchmarks/explain_plans.py
+"""
+import sys
+
+from sqlalchemy import event, text
+
+from common import DATABASE_URL, load_app, reset_db, seed
+
+VENUES = 100000
+
+# (method, path, form data, tables that must not be sequentially scanned)
+CHECKS = [
+    ('GET', '/venues/4242', None, {'Show'}),
+    ('GET', '/artists/4242', None, {'Show'}),
+    ('GET', '/shows', None, {'Show'}),
+    ('GET', '/shows?cursor=2000-01-01T00:00:00,1', None, {'Show'}),
+    ('POST', '/venues/search', {'search_term': '4242'}, {'Venue'}),
+    ('POST', '/artists/search', {'search_term': '1234'}, {'Artist'}),
+]
+
+
+def seq_scans(plan):
+    if plan.get('Node Type') == 'Seq Scan':
+        yield plan['Relation Name']
+    for child in plan.get('Plans', []):
+        yield from seq_scans(child)
+
+
+def main():
+    if not DATABASE_URL.startswith('postgresql'):
+        sys.exit('benchmarks/explain_plans.py needs BENCH_DATABASE_URL to point at PostgreSQL')
+
+    app = load_app()
+    from models import db
+
+    with app.app_context():
+        reset_db(db)
+        seed(db, venues=VENUES, artists=VENUES, shows_per_venue=2)
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+        engine = db.engine
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    client = app.test_client()
+    failures = 0
+    for method, path, data, tables in CHECKS:
+        statements.clear()
+        event.listen(engine, 'before_cursor_execute', capture)
+        response = client.open(path, method=method, data=data)
+        response.get_data()
+        event.remove(engine, 'before_cursor_execute', capture)
+
+        if response.status_code != 200:
+            print('FAIL %s %s returned %d' % (method, path, response.status_code))
+            failures += 1
+            continue
+
+        with engine.connect() as conn:
+            plans = [
+                (statement, conn.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + statement, parameters).scalar())
+                for statement, parameters in statements
+            ]
+
+        route_ok = True
+        for statement, plan in plans:
+            scanned = tables.intersection(seq_scans(plan[0]['Plan']))
+            if scanned:
+                print('FAIL %s %s seq scans %s:\n  %s' % (
+                    method, path, ', '.join(sorted(scanned)), ' '.join(statement.split())))
+                route_ok = False
+
+        if route_ok:
+            print('ok   %s %s (%d queries)' % (method, path, len(statements)))
+        else:
+            failures += 1
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Cost of the venue and artist forms: rendering the form pages and
+validating a submission.
+
+The forms of forms.py are compared with the previous declarations, which
+gave every form its own copy of the state and genre choices, checked
+submitted values by scanning them and rendered the select widgets on
+every request.
+
+Usage: python benchmarks/form_pages.py [repeat]
+"""
+import statistics
+import sys
+
+from werkzeug.datastructures import MultiDict
+
+from common import load_app, reset_db, seed, timed
+
+PAGES = ['/venues/create', '/venues/1/edit', '/artists/create', '/artists/1/edit']
+
+SUBMISSION = MultiDict([
+    ('name', 'Form Hall'), ('city', 'Austin'), ('state', 'WY'), ('address', '1 Main St'),
+    ('facebook_link', 'https://www.facebook.com/formhall'), ('genres', 'Swing'), ('genres', 'Other'),
+])
+
+
+def previous_venue_form():
+    from flask_wtf import Form
+    from wtforms import StringField, SelectField, SelectMultipleField, BooleanField
+    from wtforms.validators import DataRequired, URL
+    from forms import STATES, GENRES
+
+    class VenueForm(Form):
+        name = StringField('name', validators=[DataRequired()])
+        city = StringField('city', validators=[DataRequired()])
+        state = SelectField('state', validators=[DataRequired()], choices=[(state, state) for state in STATES])
+        address = StringField('address', validators=[DataRequired()])
+        phone = StringField('phone')
+        image_link = StringField('image_link')
+        genres = SelectMultipleField('genres', validators=[DataRequired()], choices=[(genre, genre) for genre in GENRES])
+        facebook_link = StringField('facebook_link', validators=[URL()])
+        website_link = StringField('website_link')
+        seeking_talent = BooleanField('seeking_talent')
+        seeking_description = StringField('seeking_description')
+
+    return VenueForm
+
+
+def render_selects(form_class):
+    form = form_class(meta={'csrf': False})
+    form.state(class_='form-control', placeholder='State', autofocus=True)
+    form.genres(class_='form-control', placeholder='Genres, separated by commas', autofocus=True)
+
+
+def validate(form_class):
+    assert form_class(formdata=SUBMISSION, meta={'csrf': False}).validate()
+
+
+def main(repeat):
+    app = load_app()
+    from forms import VenueForm
+    from models import db
+
+    with app.app_context():
+        reset_db(db)
+        seed(db, venues=10, artists=10)
+
+    client = app.test_client()
+    print('%-32s %12s' % ('page', 'median ms'))
+    for path in PAGES:
+        assert client.get(path).status_code == 200
+        print('%-32s %12.2f' % (path, statistics.median(timed(lambda: client.get(path).get_data(), repeat))))
+
+    PreviousVenueForm = previous_venue_form()
+    print()
+    print('%-32s %12s %12s' % ('VenueForm', 'previous us', 'now us'))
+    with app.test_request_context():
+        for name, run in [('render state and genres', render_selects), ('validate a submission', validate)]:
+            previous = statistics.median(timed(lambda: run(PreviousVenueForm), repeat))
+            now = statistics.median(timed(lambda: run(VenueForm), repeat))
+            print('%-32s %12.1f %12.1f' % (name, previous * 1000, now * 1000))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,59 @@
+"""Cost of the home page: recently listed feed against two queries per hit.
+
+The page cache is off (see common.load_app), so every request renders the
+page. The previous index() loaded the ten newest artists and venues as ORM
+instances on every request; the feed of feed.py keeps them in memory and
+rereads them from the cache backend every FEED_SYNC_INTERVAL seconds.
+
+Usage: python benchmarks/home_feed.py [venues] [repeat]
+"""
+import re
+import statistics
+import sys
+
+from common import load_app, reset_db, seed, timed
+
+TIMING_RE = re.compile(r'desc="(\d+) queries"')
+
+
+def previous_index():
+    from flask import render_template
+    from models import db, Artist, Venue
+
+    artists = db.session.query(Artist).order_by(Artist.id.desc()).limit(10).all()
+    venues = db.session.query(Venue).order_by(Venue.id.desc()).limit(10).all()
+    return render_template('pages/home.html', artists=artists, venues=venues)
+
+
+def current_index():
+    from flask import render_template
+    from feed import recent_feed
+
+    return render_template('pages/home.html', **recent_feed.recent())
+
+
+def main(venues, repeat):
+    app = load_app()
+    from models import db
+
+    with app.app_context():
+        reset_db(db)
+        seed(db, venues=venues, artists=venues)
+
+    print('%-32s %12s' % ('home page', 'median ms'))
+    with app.test_request_context('/'):
+        assert previous_index() == current_index()
+        for name, render in [('queries per request', previous_index), ('recently listed feed', current_index)]:
+            print('%-32s %12.3f' % (name, statistics.median(timed(render, repeat))))
+            db.session.remove()
+
+    client = app.test_client()
+    client.get('/')
+    response = client.get('/')
+    print()
+    print('GET / issues %s queries once the feed is built' % TIMING_RE.search(response.headers['Server-Timing']).group(1))
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [1000, 500][len(args):]))
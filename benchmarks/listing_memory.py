@@ -0,0 +1,100 @@
+"""Memory and GC cost of the shows on a venue page.
+
+A single venue gets every show in the catalogue (100k by default). The
+upcoming and past shows are read twice: once as the read models of
+listings.py, and once the previous way, as Show instances with their
+artist joined in, copied into a dict per row. The table reports peak
+traced memory, the memory still held by the result, the garbage
+collections triggered and the time taken for each.
+
+Usage: python benchmarks/listing_memory.py [shows] [artists]
+"""
+import gc
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from sqlalchemy.orm import joinedload
+
+from common import load_app, reset_db
+from datagen import generate
+
+
+def previous_shows(db, venue_id, now):
+    from models import Show
+
+    def artist_show(show):
+        return {
+            'artist_id': show.artist.id,
+            'artist_name': show.artist.name,
+            'artist_image_link': show.artist.image_link,
+            'start_time': show.start_time,
+        }
+
+    query = db.session.query(Show).options(joinedload(Show.artist)).filter(Show.venue_id == venue_id)
+    upcoming_shows = query.filter(Show.start_time > now).order_by(Show.start_time).all()
+    past_shows = query.filter(Show.start_time <= now).order_by(Show.start_time.desc()).all()
+    return list(map(artist_show, upcoming_shows)), list(map(artist_show, past_shows))
+
+
+def read_model_shows(db, venue_id, now):
+    from app import split_shows
+    from listings import ArtistShow, artist_shows
+
+    return split_shows(ArtistShow, artist_shows(venue_id), now)
+
+
+def collections():
+    return sum(generation['collections'] for generation in gc.get_stats())
+
+
+def measure(app, db, load, now):
+    """(peak MB, retained MB, collections, ms) of load() on a fresh session."""
+    with app.app_context():
+        gc.collect()
+        collected = collections()
+        tracemalloc.start()
+        start = time.perf_counter()
+
+        shows = load(db, 1, now)
+
+        elapsed = (time.perf_counter() - start) * 1000
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        collected = collections() - collected
+        db.session.remove()
+
+    del shows
+    return peak / 2 ** 20, retained / 2 ** 20, collected, elapsed
+
+
+def main(shows, artists):
+    app = load_app()
+    from models import db
+
+    with app.app_context():
+        reset_db(db)
+        generate(db, 1, artists, shows)
+
+    now = datetime.now()
+    with app.app_context():
+        previous = previous_shows(db, 1, now)
+        current = read_model_shows(db, 1, now)
+        # Same rows in the same start_time order; shows starting at the
+        # same time may come back in either order.
+        for before, after in zip(previous, current):
+            assert [show['start_time'] for show in before] == [show.start_time for show in after]
+            assert sorted(tuple(show.values()) for show in before) == sorted(after)
+        db.session.remove()
+    del previous, current
+
+    print('%d shows at one venue' % shows)
+    print('%-32s %10s %12s %12s %10s' % ('case', 'peak MB', 'retained MB', 'collections', 'ms'))
+    for name, load in [('Show + Artist instances, dicts', previous_shows), ('read models', read_model_shows)]:
+        print('%-32s %10.1f %12.1f %12d %10.0f' % ((name,) + measure(app, db, load, now)))
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [100000, 1000][len(args):]))
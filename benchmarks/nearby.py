@@ -0,0 +1,69 @@
+"""Latency of /venues/nearby lookups on the geohash index.
+
+The synthetic catalogue of datagen.py places venues around the centers of
+a few cities, most in the largest ones. Each lookup is timed through
+geo.venues_near, and through a scan filtering every venue by its bounding
+box, as a query without the geohash index has to.
+
+Usage: python benchmarks/nearby.py [venues] [repeat]
+"""
+import statistics
+import sys
+
+from sqlalchemy import select
+
+from common import load_app, reset_db, timed
+from datagen import generate
+
+# (place, latitude, longitude): the densest city, a middle one and a point
+# between cities.
+POINTS = [
+    ('New York', 40.7128, -74.0060),
+    ('Austin', 30.2672, -97.7431),
+    ('Kansas', 38.5, -98.0),
+]
+RADII_KM = [1, 5, 25, 100]
+LIMIT = 50
+
+
+def scan_near(latitude, longitude, radius_km, limit):
+    from geo import bounding_box, distance_km
+    from models import db, Venue
+
+    south, north, west, east = bounding_box(latitude, longitude, radius_km)
+    rows = db.session.execute(select(Venue.id, Venue.latitude, Venue.longitude).where(
+        Venue.latitude.between(south, north), Venue.longitude.between(west, east)
+    ))
+    found = sorted(
+        (distance, venue_id) for venue_id, distance in
+        ((venue_id, distance_km(latitude, longitude, lat, lng)) for venue_id, lat, lng in rows)
+        if distance <= radius_km
+    )
+    return [venue_id for _, venue_id in found[:limit]]
+
+
+def main(venues, repeat):
+    app = load_app()
+    from geo import venues_near
+    from models import db
+
+    with app.app_context():
+        reset_db(db)
+        generate(db, venues, 1000, 1000)
+
+        print('%d venues' % venues)
+        print('%-10s %8s %8s %14s %14s' % ('place', 'radius', 'found', 'geohash ms', 'scan ms'))
+        for place, latitude, longitude in POINTS:
+            for radius in RADII_KM:
+                nearest = [venue.id for venue in venues_near(latitude, longitude, radius, LIMIT)]
+                assert nearest == scan_near(latitude, longitude, radius, LIMIT)
+
+                indexed = statistics.median(timed(lambda: venues_near(latitude, longitude, radius, LIMIT), repeat))
+                scan = statistics.median(timed(lambda: scan_near(latitude, longitude, radius, LIMIT), repeat))
+                print('%-10s %8g %8d %14.2f %14.2f' % (place, radius, len(nearest), indexed, scan))
+                db.session.remove()
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [100000, 5][len(args):]))
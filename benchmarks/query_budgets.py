@@ -0,0 +1,120 @@
+"""Check every route against its @query_budget and for likely N+1 queries.
+
+Each route is requested once on seeded data. The query count comes from the
+Server-Timing header, and repeated statements from the N+1 warnings logged by
+instrumentation.py. Exits with status 1 when a route goes over its budget or
+repeats a statement. Budgets are set for PostgreSQL; on SQLite the search
+routes are skipped. Venues and artists are tagged with genres, as edits and
+deletes take more queries for tagged rows.
+
+Usage: python benchmarks/query_budgets.py [venues]
+"""
+import logging
+import re
+import sys
+
+from common import DATABASE_URL, load_app, reset_db, seed
+
+VENUE_FORM = {
+    'name': 'Budget Hall', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+    'phone': '', 'image_link': '', 'facebook_link': '', 'website_link': '',
+    'seeking_description': '', 'genres': ['Jazz', 'Folk'],
+}
+ARTIST_FORM = {
+    'name': 'Budget Band', 'city': 'Austin', 'state': 'TX',
+    'phone': '', 'image_link': '', 'facebook_link': '', 'website_link': '',
+    'seeking_description': '', 'genres': ['Blues'],
+}
+
+READS = [
+    '/', '/venues', '/venues?genre=Jazz', '/venues/1', '/venues/create', '/venues/1/edit',
+    '/artists', '/artists?genre=Jazz', '/artists/1', '/artists/create', '/artists/1/edit',
+    '/venues/nearby?lat=40.71&lng=-74.01&radius=25',
+    '/shows', '/shows/create', '/cache/stats', '/metrics',
+    '/api/v1/venues', '/api/v1/venues/1', '/api/v1/artists', '/api/v1/artists/1', '/api/v1/shows',
+    '/api/v1/export/venues',
+]
+SEARCHES = [
+    ('/venues/search', {'search_term': 'venue 4'}),
+    ('/venues/search', {'search_term': 'zzz'}),
+    ('/artists/search', {'search_term': 'artist'}),
+]
+WRITES = [
+    ('/venues/create', VENUE_FORM),
+    ('/artists/create', ARTIST_FORM),
+    ('/venues/1/edit', dict(VENUE_FORM, genres=['Swing'])),
+    ('/artists/1/edit', dict(ARTIST_FORM, genres=['Soul'])),
+    ('/shows/create', {'artist_id': '2', 'venue_id': '3', 'start_time': '2030-01-01 20:00:00'}),
+    ('/venues/5/delete', {}),
+]
+JSON_WRITES = [
+    ('/api/v1/shows', {'shows': [
+        {'artist_id': 4, 'venue_id': 6, 'start_time': '2031-01-{:02d}T21:00:00'.format(day)} for day in (1, 8, 15, 22)
+    ]}),
+]
+
+GENRE_TAGS = ['Jazz', 'Blues']
+
+TIMING_RE = re.compile(r'desc="(\d+) queries"')
+
+
+class Warnings(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def main(venues):
+    app = load_app()
+    from app import set_genres
+    from models import db, Venue, Artist
+
+    with app.app_context():
+        reset_db(db)
+        seed(db, venues=venues, artists=venues)
+        for model in (Venue, Artist):
+            for entity in model.query.order_by(model.id).limit(10):
+                set_genres(entity, GENRE_TAGS)
+        db.session.commit()
+
+    warnings = Warnings()
+    app.logger.addHandler(warnings)
+    adapter = app.url_map.bind('localhost')
+    client = app.test_client()
+
+    requests = [('GET', path, {}) for path in READS]
+    if DATABASE_URL.startswith('postgresql'):
+        requests += [('POST', path, {'data': form}) for path, form in SEARCHES]
+    requests += [('POST', path, {'data': form}) for path, form in WRITES]
+    requests += [('POST', path, {'json': body}) for path, body in JSON_WRITES]
+
+    failed = False
+    print('%-6s %-26s %8s %8s  %s' % ('method', 'route', 'queries', 'budget', 'status'))
+    for method, path, body in requests:
+        del warnings.messages[:]
+        response = client.open(path, method=method, **body)
+        response.get_data()
+
+        queries = int(TIMING_RE.search(response.headers['Server-Timing']).group(1))
+        endpoint, _ = adapter.match(path.split('?')[0], method=method)
+        budget = getattr(app.view_functions[endpoint], 'query_budget', None)
+
+        problems = [message for message in warnings.messages if 'N+1' in message]
+        if budget is None:
+            problems.append('no budget')
+        elif queries > budget:
+            problems.append('over budget')
+        if response.status_code >= 500:
+            problems.append('HTTP %d' % response.status_code)
+
+        failed = failed or bool(problems)
+        print('%-6s %-26s %8d %8s  %s' % (method, path, queries, budget, '; '.join(problems) or 'ok'))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,62 @@
+"""Compare the old ILIKE search against the ranked full-text search.
+
+Needs PostgreSQL: BENCH_DATABASE_URL=postgresql://... python benchmarks/search.py [rows]
+"""
+import statistics
+import sys
+
+from sqlalchemy import text
+
+from common import DATABASE_URL, load_app, reset_db, timed
+
+TERMS = ['musical hop', 'jazz', 'park sq', 'zzzz']
+
+
+def fill_venues(db, rows):
+    db.session.execute(text('''
+        INSERT INTO "Venue" (name, city, state, address, genres, seeking_talent)
+        SELECT 'Venue ' || i || ' ' || md5(i::text),
+               (ARRAY['San Francisco', 'New York', 'Austin', 'Chicago'])[i % 4 + 1],
+               (ARRAY['CA', 'NY', 'TX', 'IL'])[i % 4 + 1],
+               i || ' Main St',
+               (ARRAY['Jazz', 'Rock n Roll,Blues', 'Classical', 'Hip-Hop,Funk'])[i % 4 + 1],
+               false
+        FROM generate_series(1, :rows) AS i
+    '''), {'rows': rows})
+    db.session.execute(text('''
+        INSERT INTO "Venue" (name, city, state, address, genres, seeking_talent)
+        VALUES ('The Musical Hop', 'San Francisco', 'CA', '1015 Folsom Street', 'Jazz,Reggae', false),
+               ('Park Square Live Music & Coffee', 'San Francisco', 'CA', '34 Whiskey Moore Ave', 'Rock n Roll,Jazz', false)
+    '''))
+    db.session.commit()
+    db.session.execute(text('ANALYZE "Venue"'))
+
+
+def main(rows):
+    if not DATABASE_URL.startswith('postgresql'):
+        sys.exit('benchmarks/search.py needs BENCH_DATABASE_URL to point at PostgreSQL')
+
+    app = load_app()
+    from models import db, Venue
+    from search import search_catalog
+
+    with app.app_context():
+        reset_db(db)
+        fill_venues(db, rows)
+
+        print('%-12s %12s %12s' % ('term', 'ilike ms', 'search ms'))
+        for term in TERMS:
+            def ilike():
+                db.session.query(Venue).filter(Venue.name.ilike('%{}%'.format(term))).all()
+
+            def ranked():
+                search_catalog(Venue, term, app.config['SEARCH_RESULTS_LIMIT'])
+
+            print('%-12s %12.1f %12.1f' % (
+                term,
+                statistics.median(timed(ilike)),
+                statistics.median(timed(ranked))))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,71 @@
+"""Booking a weekly residency: 52 form posts against one batch request.
+
+The same artist plays the same venue every week for a year. The shows are
+created once through POST /shows/create, one request per show, and once
+through a single POST /api/v1/shows. The table reports the median time
+and the queries (from the Server-Timing header) to book the whole year.
+
+Usage: python benchmarks/show_booking.py [repeat]
+"""
+import re
+import statistics
+import sys
+from datetime import datetime, timedelta
+
+from common import load_app, reset_db, seed
+
+WEEKS = 52
+TIMING_RE = re.compile(r'desc="(\d+) queries"')
+
+
+def residency(year):
+    first = datetime(year, 1, 1, 21)
+    return [first + timedelta(weeks=week) for week in range(WEEKS)]
+
+
+def queries(response):
+    return int(TIMING_RE.search(response.headers['Server-Timing']).group(1))
+
+
+def form_posts(client, artist_id, venue_id, year):
+    total = 0
+    for start_time in residency(year):
+        response = client.post('/shows/create', data={
+            'artist_id': str(artist_id), 'venue_id': str(venue_id), 'start_time': start_time.isoformat(' '),
+        })
+        assert b'Show was successfully listed!' in response.get_data()
+        total += queries(response)
+    return total
+
+
+def batch_request(client, artist_id, venue_id, year):
+    response = client.post('/api/v1/shows', json={'shows': [
+        {'artist_id': artist_id, 'venue_id': venue_id, 'start_time': start_time.isoformat()}
+        for start_time in residency(year)
+    ]})
+    assert response.status_code == 201, response.get_data(as_text=True)
+    return queries(response)
+
+
+def main(repeat):
+    app = load_app()
+    from models import db
+
+    with app.app_context():
+        reset_db(db)
+        seed(db, venues=10, artists=10)
+
+    client = app.test_client()
+    print('%-32s %10s %10s' % ('%d weekly shows' % WEEKS, 'median ms', 'queries'))
+    for number, (name, book) in enumerate([('one form post per show', form_posts), ('one batch request', batch_request)]):
+        durations = []
+        for run in range(repeat):
+            # Each run books another year, as booked slots cannot be reused
+            start = datetime.now()
+            count = book(client, number + 1, number + 1, 2030 + run)
+            durations.append((datetime.now() - start).total_seconds() * 1000)
+        print('%-32s %10.1f %10d' % (name, statistics.median(durations), count))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
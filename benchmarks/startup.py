@@ -0,0 +1,90 @@
+"""Time from a cold interpreter to the first request served.
+
+Each run starts a fresh Python process, the way a server starts a worker.
+It imports app.py, builds the app with create_app() and serves one request
+through the test client. The table reports the median and maximum of each
+phase over the runs.
+
+With --max-ms, the script exits with status 1 when the median time to the
+first response is over that many milliseconds. With --output, the medians
+are also written as JSON, for CI to keep.
+
+Usage: python benchmarks/startup.py [--runs N] [--path PATH] [--max-ms MS] [--output FILE]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+PHASES = ['import_ms', 'create_app_ms', 'first_request_ms', 'total_ms']
+
+
+def child(path):
+    start = time.perf_counter()
+    from common import load_app
+    import app  # load_app() below reuses the imported module
+    imported = time.perf_counter()
+    application = load_app()
+    created = time.perf_counter()
+
+    response = application.test_client().get(path)
+    response.get_data()
+    served = time.perf_counter()
+
+    if response.status_code != 200:
+        sys.exit('GET {} returned {}'.format(path, response.status_code))
+    print(json.dumps({
+        'import_ms': (imported - start) * 1000,
+        'create_app_ms': (created - imported) * 1000,
+        'first_request_ms': (served - created) * 1000,
+        'total_ms': (served - start) * 1000,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--path', default='/venues')
+    parser.add_argument('--max-ms', type=float, help='fail when the median total is over this')
+    parser.add_argument('--output', help='write the medians to this JSON file')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.path)
+        return
+
+    from common import load_app, reset_db, seed
+
+    app = load_app()
+    from models import db
+
+    with app.app_context():
+        reset_db(db)
+        seed(db, venues=100)
+
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, __file__, '--child', '--path', args.path],
+                                check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output.splitlines()[-1]))
+
+    medians = {phase: round(statistics.median(run[phase] for run in runs), 1) for phase in PHASES}
+    print('%-18s %10s %10s' % ('phase', 'median ms', 'max ms'))
+    for phase in PHASES:
+        print('%-18s %10.1f %10.1f' % (phase[:-3], medians[phase], max(run[phase] for run in runs)))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'path': args.path, 'runs': args.runs, 'median': medians}, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    if args.max_ms is not None and medians['total_ms'] > args.max_ms:
+        print('REGRESSION median time to first response {:.0f} ms, limit {:.0f} ms'.format(medians['total_ms'], args.max_ms))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""Latency, query count and memory of every route, checked against a baseline.
+
+The catalogue from datagen.py is loaded into BENCH_DATABASE_URL, then each
+route is requested through the Flask test client. Per route, the suite
+records the p50/p95/p99 latency and the query count from the Server-Timing
+header. It also records the peak RSS of the run.
+
+Results are compared with benchmarks/baselines/<dialect>-<venues>.json:
+- A route issuing more queries than its baseline fails the run.
+- A route whose median latency is more than --tolerance (25% by default)
+  and 2 ms slower than its baseline fails the run. The tail percentiles
+  are recorded but too noisy to gate on.
+- A peak RSS more than --tolerance above the baseline fails the run.
+
+The first run for a dialect and scale writes the baseline. Rerun with
+--update to accept new numbers, and write baselines on the machine that
+checks them. The committed baselines are checked by CI with --queries-only:
+query counts are the same on any machine, latency and memory are not.
+
+Usage: python benchmarks/suite.py [--venues N] [--repeat N] [--tolerance F] [--update] [--queries-only]
+"""
+import argparse
+import json
+import os
+import re
+import resource
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import count
+
+from common import DATABASE_URL, ROOT, load_app, reset_db
+from datagen import generate
+
+BASELINES = os.path.join(ROOT, 'benchmarks', 'baselines')
+TIMING_RE = re.compile(r'desc="(\d+) queries"')
+
+# Absolute slack on latency comparisons, so sub-millisecond routes don't
+# fail on scheduling noise.
+MIN_REGRESSION_MS = 2.0
+
+VENUE_FORM = {
+    'name': 'Suite Hall', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+    'phone': '', 'image_link': '', 'facebook_link': '', 'website_link': '',
+    'seeking_description': '', 'genres': ['Jazz', 'Folk'],
+}
+ARTIST_FORM = {
+    'name': 'Suite Band', 'city': 'Austin', 'state': 'TX',
+    'phone': '', 'image_link': '', 'facebook_link': '', 'website_link': '',
+    'seeking_description': '', 'genres': ['Blues'],
+}
+
+
+def routes(postgres):
+    """(name, method, path, form) for every route; path and form may be
+    callables returning fresh ones for routes that consume their target."""
+    reads = [
+        '/', '/venues', '/venues?genre=Jazz', '/venues/1', '/venues/create', '/venues/1/edit',
+        '/artists', '/artists?genre=Jazz', '/artists/1', '/artists/create', '/artists/1/edit',
+        '/venues/nearby?lat=40.71&lng=-74.01&radius=25',
+        '/shows', '/shows/create', '/cache/stats', '/metrics',
+        '/api/v1/venues', '/api/v1/venues/1', '/api/v1/artists', '/api/v1/artists/1', '/api/v1/shows',
+        '/api/v1/export/shows',
+    ]
+    yield from (('GET ' + path, 'GET', path, None) for path in reads)
+
+    if postgres:
+        yield 'POST /venues/search', 'POST', '/venues/search', {'search_term': 'velvet hall'}
+        yield 'POST /artists/search', 'POST', '/artists/search', {'search_term': 'blue'}
+
+    yield 'POST /venues/create', 'POST', '/venues/create', VENUE_FORM
+    yield 'POST /artists/create', 'POST', '/artists/create', ARTIST_FORM
+    yield 'POST /venues/<id>/edit', 'POST', '/venues/2/edit', VENUE_FORM
+    yield 'POST /artists/<id>/edit', 'POST', '/artists/2/edit', ARTIST_FORM
+    yield 'POST /shows/create', 'POST', '/shows/create', new_show_form
+    yield 'POST /venues/<id>/delete', 'POST', create_venue_to_delete, {}
+
+
+def create_venue_to_delete():
+    from models import db, Venue
+
+    venue = Venue(name='Doomed Hall', city='Austin', state='TX', address='1 Main St', genres='Jazz')
+    db.session.add(venue)
+    db.session.commit()
+    path = '/venues/{}/delete'.format(venue.id)
+    db.session.close()
+    return path
+
+
+show_slots = count()
+
+
+def new_show_form():
+    # A show takes its slot, so each request books the next hour
+    start_time = datetime(2030, 1, 1, 20) + timedelta(hours=next(show_slots))
+    return {'artist_id': '3', 'venue_id': '3', 'start_time': start_time.isoformat(' ')}
+
+
+def percentile(values, fraction):
+    return sorted(values)[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(app, method, path, form, repeat):
+    client = app.test_client()
+    durations = []
+    queries = 0
+    for _ in range(repeat + 1):
+        with app.app_context():
+            target = path() if callable(path) else path
+        data = form() if callable(form) else form
+
+        start = time.perf_counter()
+        response = client.open(target, method=method, data=data)
+        response.get_data()
+        durations.append((time.perf_counter() - start) * 1000)
+
+        if response.status_code >= 500:
+            raise RuntimeError('{} {} returned {}'.format(method, target, response.status_code))
+        queries = int(TIMING_RE.search(response.headers['Server-Timing']).group(1))
+
+    # the first request warms up template and statement caches
+    durations = durations[1:]
+    return {
+        'p50_ms': round(percentile(durations, 0.50), 2),
+        'p95_ms': round(percentile(durations, 0.95), 2),
+        'p99_ms': round(percentile(durations, 0.99), 2),
+        'queries': queries,
+    }
+
+
+def regressions(result, baseline, tolerance, queries_only=False):
+    for name, route in result['routes'].items():
+        base = baseline['routes'].get(name)
+        if base is None:
+            continue
+        if route['queries'] > base['queries']:
+            yield '{}: {} queries, baseline {}'.format(name, route['queries'], base['queries'])
+        if queries_only:
+            continue
+        limit = max(base['p50_ms'] * (1 + tolerance), base['p50_ms'] + MIN_REGRESSION_MS)
+        if route['p50_ms'] > limit:
+            yield '{}: p50 {:.1f} ms, baseline {:.1f} ms'.format(name, route['p50_ms'], base['p50_ms'])
+
+    if not queries_only and result['peak_rss_mb'] > baseline['peak_rss_mb'] * (1 + tolerance):
+        yield 'peak RSS {:.0f} MB, baseline {:.0f} MB'.format(result['peak_rss_mb'], baseline['peak_rss_mb'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int)
+    parser.add_argument('--shows', type=int)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--update', action='store_true', help='overwrite the baseline with this run')
+    parser.add_argument('--queries-only', action='store_true',
+        help='only compare query counts, and fail without a baseline')
+    args = parser.parse_args()
+
+    artists = args.artists or args.venues
+    shows = args.shows or args.venues * 10
+    dialect = DATABASE_URL.split(':')[0].split('+')[0]
+
+    app = load_app()
+    from models import db
+
+    with app.app_context():
+        reset_db(db)
+        generate(db, args.venues, artists, shows)
+
+    result = {
+        'scale': {'venues': args.venues, 'artists': artists, 'shows': shows, 'repeat': args.repeat},
+        'routes': {},
+    }
+    print('%-28s %9s %9s %9s %8s' % ('route', 'p50 ms', 'p95 ms', 'p99 ms', 'queries'))
+    for name, method, path, form in routes(dialect == 'postgresql'):
+        route = result['routes'][name] = measure(app, method, path, form, args.repeat)
+        print('%-28s %9.1f %9.1f %9.1f %8d' % (name, route['p50_ms'], route['p95_ms'], route['p99_ms'], route['queries']))
+
+    result['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    print('peak RSS %.0f MB' % result['peak_rss_mb'])
+
+    path = os.path.join(BASELINES, '{}-{}.json'.format(dialect, args.venues))
+    if args.queries_only and not os.path.exists(path):
+        sys.exit('No baseline at {}'.format(os.path.relpath(path, ROOT)))
+    if args.update or not os.path.exists(path):
+        os.makedirs(BASELINES, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print('Baseline written to', os.path.relpath(path, ROOT))
+        return
+
+    with open(path) as f:
+        baseline = json.load(f)
+
+    failures = list(regressions(result, baseline, args.tolerance, args.queries_only))
+    for failure in failures:
+        print('REGRESSION', failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
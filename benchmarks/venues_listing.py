@@ -0,0 +1,32 @@
+"""Query count and latency of the /venues city listing.
+
+Usage: python benchmarks/venues_listing.py [venue counts...]
+"""
+import statistics
+import sys
+
+from common import QueryCounter, load_app, reset_db, seed, timed
+
+
+def main(sizes):
+    app = load_app()
+    from models import db
+
+    client = app.test_client()
+    print('%10s %8s %10s %10s' % ('venues', 'queries', 'median ms', 'max ms'))
+    for size in sizes:
+        with app.app_context():
+            reset_db(db)
+            seed(db, venues=size)
+            engine = db.engine
+
+        with QueryCounter(engine) as counter:
+            assert client.get('/venues').status_code == 200
+
+        durations = timed(lambda: client.get('/venues'))
+        print('%10d %8d %10.1f %10.1f' % (
+            size, counter.count, statistics.median(durations), max(durations)))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000])
@@ -0,0 +1,78 @@
+from collections import namedtuple
+
+from sqlalchemy import insert, literal, or_, select, union_all
+
+from models import db, Venue, Artist, Show
+
+# A show has no end time, so a double booking is two shows of the same venue,
+# or of the same artist, starting at the same time. The unique indexes on
+# Show (venue_id, start_time) and (artist_id, start_time) refuse them; the
+# functions below only report them.
+
+Booking = namedtuple('Booking', 'artist_id venue_id start_time')
+
+def slots(booking):
+    return (('venue', booking.venue_id, booking.start_time), ('artist', booking.artist_id, booking.start_time))
+
+def insert_show(booking):
+    """INSERT of booking, made only if its artist and venue both exist.
+
+    Checking both and inserting take one statement; it returns the new
+    show id, or no row when the artist or the venue is missing.
+    """
+    return insert(Show).from_select(
+        ['artist_id', 'venue_id', 'start_time'],
+        select(Artist.id, Venue.id, literal(booking.start_time, Show.start_time.type)
+        ).join(Venue, Venue.id == booking.venue_id
+        ).where(Artist.id == booking.artist_id)
+    ).returning(Show.id)
+
+def clashes(bookings):
+    """Bookings taking a slot already taken earlier in the same list."""
+    taken = set()
+    clashing = []
+    for booking in bookings:
+        if taken.intersection(slots(booking)):
+            clashing.append(booking)
+        taken.update(slots(booking))
+    return clashing
+
+def unknown_references(bookings):
+    """(artist ids, venue ids) of bookings with no such row, in one query."""
+    artist_ids = {booking.artist_id for booking in bookings}
+    venue_ids = {booking.venue_id for booking in bookings}
+
+    found = db.session.execute(union_all(
+        select(literal('artist'), Artist.id).where(Artist.id.in_(artist_ids)),
+        select(literal('venue'), Venue.id).where(Venue.id.in_(venue_ids)),
+    )).all()
+    return (
+        sorted(artist_ids - {entity_id for kind, entity_id in found if kind == 'artist'}),
+        sorted(venue_ids - {entity_id for kind, entity_id in found if kind == 'venue'}),
+    )
+
+def booked(bookings):
+    """Bookings whose venue or artist already has a show at that time."""
+    taken = db.session.query(Show.venue_id, Show.artist_id, Show.start_time).filter(
+        Show.start_time.in_({booking.start_time for booking in bookings}),
+        or_(
+            Show.venue_id.in_({booking.venue_id for booking in bookings}),
+            Show.artist_id.in_({booking.artist_id for booking in bookings}),
+        )
+    )
+    taken = {slot for show in taken for slot in slots(Booking(show.artist_id, show.venue_id, show.start_time))}
+    return [booking for booking in bookings if taken.intersection(slots(booking))]
+
+def insert_shows(bookings):
+    """Insert bookings in one statement and return their show ids, in order.
+
+    The rows returned are matched back to the bookings by venue and start
+    time, which identify a show, rather than asking for them in parameter
+    order: SQLite can only keep that order one INSERT per row.
+    """
+    inserted = db.session.execute(
+        insert(Show).returning(Show.id, Show.venue_id, Show.start_time),
+        [booking._asdict() for booking in bookings]
+    )
+    ids = {(venue_id, start_time): show_id for show_id, venue_id, start_time in inserted}
+    return [ids[booking.venue_id, booking.start_time] for booking in bookings]
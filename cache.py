@@ -0,0 +1,185 @@
+import hashlib
+import time
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+
+from flask import Response, g, make_response, request, session
+
+
+class MemoryBackend:
+    """In-process LRU store with a per-entry TTL."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+
+class RedisBackend:
+    """Store backed by any client exposing Redis' get/setex/delete."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key):
+        value = self.client.get(key)
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+    def set(self, key, value, ttl):
+        self.client.setex(key, ttl, value)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*keys)
+
+
+class PageCache:
+    def __init__(self):
+        self.backend = None
+        self.ttl = 0
+        self.prefix = ''
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app, backend=None):
+        self.ttl = app.config['CACHE_TTL']
+        self.prefix = app.config['CACHE_KEY_PREFIX']
+
+        if backend is None and app.config['CACHE_BACKEND'] == 'redis':
+            import redis
+            backend = RedisBackend(redis.Redis.from_url(app.config['CACHE_REDIS_URL']))
+        elif backend is None:
+            backend = MemoryBackend(app.config['CACHE_MAX_ENTRIES'])
+
+        self.backend = backend
+
+    def get(self, key, version=''):
+        """The value stored under key, if it was stored for this version."""
+        value = self.backend.get(self.prefix + key)
+        if value is not None:
+            stored_version, _, value = value.partition('\n')
+            if stored_version != version:
+                value = None
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, version=''):
+        # A TTL of 0 turns caching off
+        if self.ttl > 0:
+            self.backend.set(self.prefix + key, version + '\n' + value, self.ttl)
+
+    def invalidate(self, *keys):
+        self.backend.delete(*(self.prefix + key for key in keys))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def cached(self, key):
+        """Cache the HTML rendered by a view under key(**view_args).
+
+        Requests with a query string, or with flashed messages waiting to be
+        rendered into the layout, bypass the cache. Under conditional(), the
+        page's ETag is stored with the HTML, and a page cached for another
+        ETag is rendered again, so a page is never served from the cache
+        once its data has changed. Each page keeps one entry under its key,
+        which invalidate() deletes.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                if request.args or session.get('_flashes'):
+                    return view(**kwargs)
+
+                cache_key = key(**kwargs)
+                version = g.get('page_version', '')
+                html = self.get(cache_key, version)
+                if html is None:
+                    html = view(**kwargs)
+                    self.set(cache_key, html, version)
+                return html
+            return wrapper
+        return decorator
+
+
+page_cache = PageCache()
+
+def conditional(validate):
+    """Answer 304 Not Modified when the client already has the current page.
+
+    validate(**view_args) returns (last_modified, *version) from a cheap
+    query, or None to let the view handle the request (e.g. to 404). The
+    ETag is derived from the request path and the whole tuple, so version
+    should include row counts that change when rows are deleted.
+
+    No Last-Modified header is sent: it only has a precision of seconds,
+    so If-Modified-Since would answer 304 to a client that saw the page
+    before a second change in the same second.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            if session.get('_flashes'):
+                return view(**kwargs)
+
+            validators = validate(**kwargs)
+            if validators is None or validators[0] is None:
+                return view(**kwargs)
+
+            etag = hashlib.md5(repr((request.path, validators)).encode('utf-8')).hexdigest()
+            g.page_version = etag
+
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                response = make_response(view(**kwargs))
+            response.set_etag(etag)
+            return response
+        return wrapper
+    return decorator
+
+def setup_cache(app, backend=None):
+    page_cache.init_app(app, backend)
+
+
+# Cache keys of the rendered pages.
+
+INDEX_PAGE = 'index'
+VENUES_PAGE = 'venues'
+ARTISTS_PAGE = 'artists'
+
+def venue_page(venue_id):
+    return 'venue:{}'.format(venue_id)
+
+def artist_page(artist_id):
+    return 'artist:{}'.format(artist_id)
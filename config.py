@@ -18,5 +18,78 @@ DEBUG = True
 # Connect to the database
 
 
-# TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = database_path
+SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', database_path)
+
+# Connection pool, per worker process. With DB_PGBOUNCER=1 the app connects
+# through PgBouncer in transaction pooling mode and keeps no pool of its own.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 5))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 10))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', '1') == '1'
+# Milliseconds; 0 disables the timeout
+DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', 0))
+DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', '0') == '1'
+
+# Comma-separated read replicas serving GET and HEAD requests. A replica is
+# skipped while unreachable or more than DB_REPLICA_MAX_LAG seconds behind,
+# rechecked every DB_REPLICA_CHECK_INTERVAL seconds; without a usable
+# replica, reads go to the primary.
+DATABASE_REPLICA_URLS = [url for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url]
+DB_REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', 5))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', 10))
+# Seconds a client keeps reading from the primary after it wrote
+DB_READ_YOUR_WRITES = int(os.getenv('DB_READ_YOUR_WRITES', 10))
+
+# Number of shows rendered per page on /shows
+SHOWS_PER_PAGE = 60
+
+# Maximum number of ranked matches rendered by the search pages
+SEARCH_RESULTS_LIMIT = 50
+
+# Venues listed by /venues/nearby, and its default and maximum radius in km
+NEARBY_RESULTS_LIMIT = 50
+NEARBY_DEFAULT_RADIUS_KM = 10
+NEARBY_MAX_RADIUS_KM = 100
+
+# Geocoder used by `flask geocode-venues`, as 'module:Class'. The default
+# places venues of a few known cities from a local table, without network
+# access; production points this at a geocoder built on a real service.
+GEOCODER = os.getenv('GEOCODER', 'geocoding:FixtureGeocoder')
+
+# Default and maximum page size of the /api/v1 listings
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+# Most shows POST /api/v1/shows creates in one request and one INSERT
+API_MAX_BATCH_SIZE = 1000
+
+# Rows fetched per server-side cursor round trip by the catalog export
+EXPORT_BATCH_SIZE = 1000
+# Seconds an incremental export goes back over the previous one. updated_at
+# is set when a row is flushed, so a transaction committing after an export
+# can add rows older than its watermark; this should exceed the longest
+# write transaction.
+EXPORT_WATERMARK_OVERLAP = 60
+
+# A statement repeated this many times in one request is logged as a likely N+1
+N_PLUS_ONE_THRESHOLD = 5
+# Raise instead of logging when a view exceeds its @query_budget (for CI runs)
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', '0') == '1'
+
+# Rendered page cache: 'memory' (per-process LRU) or 'redis'
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://127.0.0.1:6379/0')
+CACHE_KEY_PREFIX = 'fyyur:page:'
+# Seconds a rendered page is kept; 0 turns the cache off
+CACHE_TTL = int(os.getenv('CACHE_TTL', 60))
+CACHE_MAX_ENTRIES = 1024
+
+# Recently listed artists and venues on the home page, kept in memory by
+# each worker and shared through the cache backend. Workers reread the
+# shared feed every FEED_SYNC_INTERVAL seconds; it is rebuilt from the
+# database after FEED_TTL seconds, picking up rows imported from the CLI.
+# With FEED_TTL = 0 it is not shared, and each worker rebuilds its own.
+FEED_SIZE = 10
+FEED_SYNC_INTERVAL = 5
+FEED_TTL = int(os.getenv('FEED_TTL', 300))
+FEED_CACHE_KEY = 'fyyur:feed'
@@ -0,0 +1,48 @@
+from sqlalchemy import case, func, select
+
+from models import db, Venue, Artist, Show
+
+# Entities carrying denormalized show counters, with the Show column
+# referencing each of them.
+COUNTED = ((Venue, Show.venue_id), (Artist, Show.artist_id))
+
+def show_added(show, now):
+    """Count a newly inserted show against its venue and artist."""
+    for model, show_fk in COUNTED:
+        entity = db.session.query(model).filter(model.id == getattr(show, show_fk.key))
+
+        if show.start_time > now:
+            entity.update({
+                model.upcoming_shows_count: model.upcoming_shows_count + 1,
+                model.next_show_at: case(
+                    (model.next_show_at == None, show.start_time),
+                    (model.next_show_at > show.start_time, show.start_time),
+                    else_=model.next_show_at
+                ),
+            }, synchronize_session=False)
+        else:
+            entity.update({
+                model.past_shows_count: model.past_shows_count + 1,
+            }, synchronize_session=False)
+
+def refresh_counters(model, show_fk, criterion, now):
+    """Recompute the counters of the model rows matching criterion."""
+    upcoming = Show.start_time > now
+
+    return db.session.query(model).filter(criterion).update({
+        model.upcoming_shows_count: select(func.count(Show.id)).where(show_fk == model.id, upcoming).scalar_subquery(),
+        model.past_shows_count: select(func.count(Show.id)).where(show_fk == model.id, ~upcoming).scalar_subquery(),
+        model.next_show_at: select(func.min(Show.start_time)).where(show_fk == model.id, upcoming).scalar_subquery(),
+    }, synchronize_session=False)
+
+def rollover(now):
+    """Refresh every venue and artist whose next show has started.
+
+    Only rows with next_show_at in the past are touched, so running this
+    every minute costs an index range scan when nothing has changed.
+    Returns the number of rows refreshed.
+    """
+    return sum(
+        refresh_counters(model, show_fk, model.next_show_at <= now, now)
+        for model, show_fk in COUNTED
+    )
@@ -7,7 +7,8 @@ from fabric.contrib.console import confirm
 def test():
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python benchmarks/query_budgets.py && python benchmarks/suite.py && python benchmarks/startup.py",
+            capture=True
         )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
@@ -0,0 +1,130 @@
+import json
+import time
+from collections import deque
+
+from sqlalchemy import select
+
+from models import db, Venue, Artist
+from listings import EntityTile
+
+# Entities listed on the home page, newest first.
+FEED_KINDS = {
+    'artists': Artist,
+    'venues': Venue,
+}
+
+
+class RecentFeed:
+    """The recently listed artists and venues of the home page.
+
+    Each worker keeps the feed in memory, as one bounded deque per kind.
+    The feed is stored in the page cache's backend too, so that with Redis
+    a listing made by one worker reaches the others: a worker rereads the
+    stored feed every FEED_SYNC_INTERVAL seconds. The database is only
+    read when no feed is stored, the first time or once FEED_TTL has
+    passed, which also picks up rows written outside the app.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.key = None
+        self.size = 0
+        self.sync_interval = 0
+        self.ttl = 0
+        self.feed = None
+        self.synced_at = None
+
+    def init_app(self, app, backend):
+        self.backend = backend
+        self.key = app.config['FEED_CACHE_KEY']
+        self.size = app.config['FEED_SIZE']
+        self.sync_interval = app.config['FEED_SYNC_INTERVAL']
+        self.ttl = app.config['FEED_TTL']
+        self.feed = None
+
+    def queries(self):
+        return {
+            kind: select(model.id, model.name, model.image_link).order_by(model.id.desc()).limit(self.size)
+            for kind, model in FEED_KINDS.items()
+        }
+
+    def shared(self):
+        """The stored feed as {kind: deque of EntityTile}, or None."""
+        value = self.backend.get(self.key)
+        if value is None:
+            return None
+        return {kind: deque(map(EntityTile._make, items), self.size) for kind, items in json.loads(value).items()}
+
+    def store(self, feed):
+        # With a TTL of 0 the feed is not shared, and is rebuilt every sync interval
+        if self.ttl > 0:
+            self.backend.set(self.key, json.dumps({kind: list(items) for kind, items in feed.items()}), self.ttl)
+        self.feed = feed
+        self.synced_at = time.monotonic()
+
+    def publish(self, rows):
+        """Store a feed built from {kind: (id, name, image_link) rows} and return it."""
+        feed = {kind: deque(map(EntityTile._make, rows[kind]), self.size) for kind in FEED_KINDS}
+        self.store(feed)
+        return {kind: list(items) for kind, items in feed.items()}
+
+    def loaded(self):
+        """{kind: list of EntityTile} without reading the database, or None
+        when no worker has built the feed yet."""
+        if self.feed is None or time.monotonic() - self.synced_at >= self.sync_interval:
+            feed = self.shared()
+            if feed is None:
+                self.feed = None
+                return None
+            self.feed = feed
+            self.synced_at = time.monotonic()
+
+        return {kind: list(items) for kind, items in self.feed.items()}
+
+    def recent(self):
+        """{kind: list of EntityTile}, built from the database if need be."""
+        return self.loaded() or self.publish({
+            kind: db.session.execute(query).all() for kind, query in self.queries().items()
+        })
+
+    def change(self, apply):
+        # Applied to the stored feed, the freshest one. Without a stored
+        # feed, the next read rebuilds it with the change.
+        feed = self.shared()
+        if feed is None:
+            self.feed = None
+            return
+        if apply(feed) is not False:
+            self.store(feed)
+
+    def listed(self, kind, tile):
+        """Put a newly created entity at the head of its feed."""
+        self.change(lambda feed: feed[kind].appendleft(tile))
+
+    def updated(self, kind, tile):
+        """Replace the tile of an edited entity, if it is in the feed."""
+        def replace(feed):
+            items = feed[kind]
+            for position, current in enumerate(items):
+                if current.id == tile.id:
+                    items[position] = tile
+                    return True
+            return False
+        self.change(replace)
+
+    def removed(self, kind, entity_id):
+        """Drop the stored feed if it shows a deleted entity: only the
+        database knows which entity takes its place."""
+        feed = self.shared()
+        if feed is None or any(tile.id == entity_id for tile in feed[kind]):
+            self.invalidate()
+
+    def invalidate(self):
+        self.backend.delete(self.key)
+        self.feed = None
+
+
+recent_feed = RecentFeed()
+
+def setup_feed(app, backend):
+    recent_feed.init_app(app, backend)
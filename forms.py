@@ -1,7 +1,101 @@
 from datetime import datetime
 from flask_wtf import Form
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms.validators import DataRequired, AnyOf, URL, ValidationError
+from wtforms.widgets import Select
+
+# Choice tables shared by every form. The tuples keep the order the options
+# are rendered in; the frozensets check submitted values in O(1), replacing
+# the select fields' own scan of their choices.
+
+STATES = (
+    'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'DC', 'FL', 'GA', 'HI', 'ID',
+    'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME', 'MT', 'NE', 'NV', 'NH', 'NJ', 'NM',
+    'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'MD', 'MA', 'MI', 'MN', 'MS', 'MO', 'PA',
+    'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY',
+)
+GENRES = (
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk',
+    'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop',
+    'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul', 'Swing', 'Other',
+)
+
+STATE_CHOICES = tuple((state, state) for state in STATES)
+GENRE_CHOICES = tuple((genre, genre) for genre in GENRES)
+VALID_STATES = frozenset(STATES)
+VALID_GENRES = frozenset(GENRES)
+
+# Rendered select widgets kept per widget before the cache is emptied
+FRAGMENT_CACHE_SIZE = 256
+
+
+class AnyOfEach(AnyOf):
+    """AnyOf for fields holding a list of values, such as SelectMultipleField."""
+
+    def __call__(self, form, field):
+        invalid = [value for value in field.data or () if value not in self.values]
+        if invalid:
+            message = self.message or field.ngettext(
+                "'%(value)s' is not a valid choice for this field.",
+                "'%(value)s' are not valid choices for this field.",
+                len(invalid),
+            )
+            raise ValidationError(message % dict(value="', '".join(invalid)))
+
+
+class CachedSelect(Select):
+    """Select widget reusing its HTML while the field renders the same way.
+
+    The output depends on the field's id, name, choices, selection, flags
+    and the render arguments, so those make up the cache key. Fields whose
+    choices are not a tuple, or that are rendered with unhashable
+    arguments, are rendered every time.
+    """
+
+    def __init__(self, multiple=False):
+        super().__init__(multiple)
+        self.rendered = {}
+
+    def __call__(self, field, **kwargs):
+        if not isinstance(field.choices, tuple):
+            return super().__call__(field, **kwargs)
+
+        selection = tuple(field.data or ()) if self.multiple else field.data
+        key = (field.id, field.name, field.choices, selection,
+               tuple(sorted(vars(field.flags).items())), tuple(sorted(kwargs.items())))
+        try:
+            html = self.rendered.get(key)
+        except TypeError:
+            return super().__call__(field, **kwargs)
+
+        if html is None:
+            if len(self.rendered) >= FRAGMENT_CACHE_SIZE:
+                self.rendered.clear()
+            html = self.rendered[key] = super().__call__(field, **kwargs)
+        return html
+
+
+class FrozenSelectField(SelectField):
+    """SelectField over a shared choice table.
+
+    WTForms copies the choices into a new list for every form; the table
+    is kept as given instead. Submitted values are checked by the field's
+    validators (AnyOf a frozenset) rather than a scan of the choices.
+    """
+    widget = CachedSelect()
+
+    def __init__(self, label=None, validators=None, choices=(), **kwargs):
+        super().__init__(label, validators, validate_choice=False, **kwargs)
+        self.choices = choices
+
+class FrozenSelectMultipleField(SelectMultipleField):
+    """SelectMultipleField over a shared choice table, like FrozenSelectField."""
+    widget = CachedSelect(multiple=True)
+
+    def __init__(self, label=None, validators=None, choices=(), **kwargs):
+        super().__init__(label, validators, validate_choice=False, **kwargs)
+        self.choices = choices
+
 
 class ShowForm(Form):
     artist_id = StringField(
@@ -23,61 +117,9 @@ class VenueForm(Form):
     city = StringField(
         'city', validators=[DataRequired()]
     )
-    state = SelectField(
-        'state', validators=[DataRequired()],
-        choices=[
-            ('AL', 'AL'),
-            ('AK', 'AK'),
-            ('AZ', 'AZ'),
-            ('AR', 'AR'),
-            ('CA', 'CA'),
-            ('CO', 'CO'),
-            ('CT', 'CT'),
-            ('DE', 'DE'),
-            ('DC', 'DC'),
-            ('FL', 'FL'),
-            ('GA', 'GA'),
-            ('HI', 'HI'),
-            ('ID', 'ID'),
-            ('IL', 'IL'),
-            ('IN', 'IN'),
-            ('IA', 'IA'),
-            ('KS', 'KS'),
-            ('KY', 'KY'),
-            ('LA', 'LA'),
-            ('ME', 'ME'),
-            ('MT', 'MT'),
-            ('NE', 'NE'),
-            ('NV', 'NV'),
-            ('NH', 'NH'),
-            ('NJ', 'NJ'),
-            ('NM', 'NM'),
-            ('NY', 'NY'),
-            ('NC', 'NC'),
-            ('ND', 'ND'),
-            ('OH', 'OH'),
-            ('OK', 'OK'),
-            ('OR', 'OR'),
-            ('MD', 'MD'),
-            ('MA', 'MA'),
-            ('MI', 'MI'),
-            ('MN', 'MN'),
-            ('MS', 'MS'),
-            ('MO', 'MO'),
-            ('PA', 'PA'),
-            ('RI', 'RI'),
-            ('SC', 'SC'),
-            ('SD', 'SD'),
-            ('TN', 'TN'),
-            ('TX', 'TX'),
-            ('UT', 'UT'),
-            ('VT', 'VT'),
-            ('VA', 'VA'),
-            ('WA', 'WA'),
-            ('WV', 'WV'),
-            ('WI', 'WI'),
-            ('WY', 'WY'),
-        ]
+    state = FrozenSelectField(
+        'state', validators=[DataRequired(), AnyOf(VALID_STATES, message='Not a valid choice.')],
+        choices=STATE_CHOICES
     )
     address = StringField(
         'address', validators=[DataRequired()]
@@ -88,31 +130,9 @@ class VenueForm(Form):
     image_link = StringField(
         'image_link'
     )
-    genres = SelectMultipleField(
-        # TODO implement enum restriction
-        'genres', validators=[DataRequired()],
-        choices=[
-            ('Alternative', 'Alternative'),
-            ('Blues', 'Blues'),
-            ('Classical', 'Classical'),
-            ('Country', 'Country'),
-            ('Electronic', 'Electronic'),
-            ('Folk', 'Folk'),
-            ('Funk', 'Funk'),
-            ('Hip-Hop', 'Hip-Hop'),
-            ('Heavy Metal', 'Heavy Metal'),
-            ('Instrumental', 'Instrumental'),
-            ('Jazz', 'Jazz'),
-            ('Musical Theatre', 'Musical Theatre'),
-            ('Pop', 'Pop'),
-            ('Punk', 'Punk'),
-            ('R&B', 'R&B'),
-            ('Reggae', 'Reggae'),
-            ('Rock n Roll', 'Rock n Roll'),
-            ('Soul', 'Soul'),
-            ('Swing', 'Swing'),
-            ('Other', 'Other'),
-        ]
+    genres = FrozenSelectMultipleField(
+        'genres', validators=[DataRequired(), AnyOfEach(VALID_GENRES)],
+        choices=GENRE_CHOICES
     )
     facebook_link = StringField(
         'facebook_link', validators=[URL()]
@@ -136,93 +156,20 @@ class ArtistForm(Form):
     city = StringField(
         'city', validators=[DataRequired()]
     )
-    state = SelectField(
-        'state', validators=[DataRequired()],
-        choices=[
-            ('AL', 'AL'),
-            ('AK', 'AK'),
-            ('AZ', 'AZ'),
-            ('AR', 'AR'),
-            ('CA', 'CA'),
-            ('CO', 'CO'),
-            ('CT', 'CT'),
-            ('DE', 'DE'),
-            ('DC', 'DC'),
-            ('FL', 'FL'),
-            ('GA', 'GA'),
-            ('HI', 'HI'),
-            ('ID', 'ID'),
-            ('IL', 'IL'),
-            ('IN', 'IN'),
-            ('IA', 'IA'),
-            ('KS', 'KS'),
-            ('KY', 'KY'),
-            ('LA', 'LA'),
-            ('ME', 'ME'),
-            ('MT', 'MT'),
-            ('NE', 'NE'),
-            ('NV', 'NV'),
-            ('NH', 'NH'),
-            ('NJ', 'NJ'),
-            ('NM', 'NM'),
-            ('NY', 'NY'),
-            ('NC', 'NC'),
-            ('ND', 'ND'),
-            ('OH', 'OH'),
-            ('OK', 'OK'),
-            ('OR', 'OR'),
-            ('MD', 'MD'),
-            ('MA', 'MA'),
-            ('MI', 'MI'),
-            ('MN', 'MN'),
-            ('MS', 'MS'),
-            ('MO', 'MO'),
-            ('PA', 'PA'),
-            ('RI', 'RI'),
-            ('SC', 'SC'),
-            ('SD', 'SD'),
-            ('TN', 'TN'),
-            ('TX', 'TX'),
-            ('UT', 'UT'),
-            ('VT', 'VT'),
-            ('VA', 'VA'),
-            ('WA', 'WA'),
-            ('WV', 'WV'),
-            ('WI', 'WI'),
-            ('WY', 'WY'),
-        ]
+    state = FrozenSelectField(
+        'state', validators=[DataRequired(), AnyOf(VALID_STATES, message='Not a valid choice.')],
+        choices=STATE_CHOICES
     )
     phone = StringField(
-        # TODO implement validation logic for state
         'phone'
     )
     image_link = StringField(
         'image_link'
     )
-    genres = SelectMultipleField(
-        'genres', validators=[DataRequired()],
-        choices=[
-            ('Alternative', 'Alternative'),
-            ('Blues', 'Blues'),
-            ('Classical', 'Classical'),
-            ('Country', 'Country'),
-            ('Electronic', 'Electronic'),
-            ('Folk', 'Folk'),
-            ('Funk', 'Funk'),
-            ('Hip-Hop', 'Hip-Hop'),
-            ('Heavy Metal', 'Heavy Metal'),
-            ('Instrumental', 'Instrumental'),
-            ('Jazz', 'Jazz'),
-            ('Musical Theatre', 'Musical Theatre'),
-            ('Pop', 'Pop'),
-            ('Punk', 'Punk'),
-            ('R&B', 'R&B'),
-            ('Reggae', 'Reggae'),
-            ('Rock n Roll', 'Rock n Roll'),
-            ('Soul', 'Soul'),
-            ('Other', 'Other'),
-        ]
-     )
+    genres = FrozenSelectMultipleField(
+        'genres', validators=[DataRequired(), AnyOfEach(VALID_GENRES)],
+        choices=GENRE_CHOICES
+    )
     facebook_link = StringField(
         # TODO implement enum restriction
         'facebook_link', validators=[URL()]
@@ -237,4 +184,3 @@ class ArtistForm(Form):
     seeking_description = StringField(
             'seeking_description'
      )
-
@@ -0,0 +1,176 @@
+import heapq
+import math
+
+from sqlalchemy import and_, or_, select
+
+from models import db, Venue
+from listings import NearbyVenue
+
+# Geohashes name the cells of a grid that halves longitude and latitude in
+# turn, five halvings per base 32 character. Points in a cell share its
+# geohash as a prefix, so the cells around a point are a few ranges of a
+# btree index on the geohash column, with no spatial extension needed.
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Characters stored per venue; a cell of 9 characters is under 5 m wide.
+GEOHASH_PRECISION = 9
+
+# Radius of the first circle searched by venues_near(); each next circle
+# is four times wider, up to the radius asked for.
+FIRST_RADIUS_KM = 0.25
+
+# Most cells looked up by one query. The finest precision whose
+# cells cover the search area within this many is used.
+MAX_CELLS = 16
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """The geohash of a point."""
+    south, north, west, east = -90.0, 90.0, -180.0, 180.0
+    chars = []
+    value = bits = 0
+    for bit in range(5 * precision):
+        if bit % 2 == 0:
+            middle = (west + east) / 2
+            value = value << 1 | (longitude >= middle)
+            west, east = (middle, east) if longitude >= middle else (west, middle)
+        else:
+            middle = (south + north) / 2
+            value = value << 1 | (latitude >= middle)
+            south, north = (middle, north) if latitude >= middle else (south, middle)
+
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            value = bits = 0
+    return ''.join(chars)
+
+def cell_size(precision):
+    """(degrees of latitude, degrees of longitude) of a cell."""
+    bits = 5 * precision
+    return 180 / 2 ** (bits // 2), 360 / 2 ** ((bits + 1) // 2)
+
+def distance_km(latitude, longitude, other_latitude, other_longitude):
+    """Great-circle distance, by the haversine formula."""
+    phi, other_phi = math.radians(latitude), math.radians(other_latitude)
+    a = math.sin((other_phi - phi) / 2) ** 2 \
+        + math.cos(phi) * math.cos(other_phi) * math.sin(math.radians(other_longitude - longitude) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def bounding_box(latitude, longitude, radius_km):
+    """(south, north, west, east) around the circle; west and east may run
+    past -180 and 180."""
+    delta_latitude = radius_km / KM_PER_DEGREE
+    south, north = max(-90.0, latitude - delta_latitude), min(90.0, latitude + delta_latitude)
+
+    # Degrees of longitude shrink towards the poles; a circle reaching a
+    # pole spans every longitude.
+    widest = max(abs(south), abs(north))
+    if widest >= 90.0:
+        return south, north, -180.0, 180.0
+    delta_longitude = min(180.0, delta_latitude / math.cos(math.radians(widest)))
+    return south, north, longitude - delta_longitude, longitude + delta_longitude
+
+def covering_cells(latitude, longitude, radius_km, max_cells=MAX_CELLS):
+    """Geohash prefixes of the cells covering the circle's bounding box.
+
+    The finest precision needing at most max_cells cells is chosen. An
+    empty prefix stands for the whole world.
+    """
+    south, north, west, east = bounding_box(latitude, longitude, radius_km)
+    cells = ['']
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        cell_latitude, cell_longitude = cell_size(precision)
+        columns = round(360 / cell_longitude)
+
+        rows = range(int((south + 90) // cell_latitude), min(int((north + 90) // cell_latitude), round(180 / cell_latitude) - 1) + 1)
+        if east - west >= 360:
+            spanned = range(columns)
+        else:
+            spanned = {column % columns for column in range(int((west + 180) // cell_longitude), int((east + 180) // cell_longitude) + 1)}
+        if len(rows) * len(spanned) > max_cells:
+            break
+
+        cells = [
+            encode(-90 + (row + 0.5) * cell_latitude, -180 + (column + 0.5) * cell_longitude, precision)
+            for row in rows for column in spanned
+        ]
+    return cells
+
+def successor(prefix):
+    """The first geohash after all those starting with prefix, or None."""
+    for position in reversed(range(len(prefix))):
+        index = BASE32.index(prefix[position])
+        if index < len(BASE32) - 1:
+            return prefix[:position] + BASE32[index + 1]
+    return None
+
+def prefix_ranges(prefixes):
+    """[start, end) geohash ranges holding the prefixes, adjacent ones merged.
+
+    end is None for a range running to the last geohash.
+    """
+    ranges = []
+    for prefix in sorted(set(prefixes)):
+        if ranges and ranges[-1][1] == prefix:
+            ranges[-1][1] = successor(prefix)
+        else:
+            ranges.append([prefix, successor(prefix)])
+    return ranges
+
+def in_ranges(column, ranges):
+    return or_(*(
+        column >= start if end is None else and_(column >= start, column < end)
+        for start, end in ranges
+    ))
+
+def search_radii(radius_km):
+    """Radii of the circles searched in turn, ending with radius_km."""
+    radii = [radius_km]
+    while radii[0] / 4 >= FIRST_RADIUS_KM:
+        radii.insert(0, radii[0] / 4)
+    return radii
+
+def venues_within(latitude, longitude, radius_km):
+    """NearbyVenue tuples of every venue within radius_km of a point.
+
+    The geohash index narrows the venues read to the cells covering the
+    circle; their exact distances are computed here.
+    """
+    south, north, _, _ = bounding_box(latitude, longitude, radius_km)
+    candidates = db.session.execute(select(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.upcoming_shows_count,
+        Venue.latitude,
+        Venue.longitude
+    ).where(
+        in_ranges(Venue.geohash, prefix_ranges(covering_cells(latitude, longitude, radius_km))),
+        Venue.latitude.between(south, north)
+    ))
+
+    found = []
+    for venue_id, name, city, state, upcoming, venue_latitude, venue_longitude in candidates:
+        distance = distance_km(latitude, longitude, venue_latitude, venue_longitude)
+        if distance <= radius_km:
+            found.append(NearbyVenue(venue_id, name, city, state, upcoming, distance))
+    return found
+
+def venues_near(latitude, longitude, radius_km, limit):
+    """The limit venues nearest to a point within radius_km, nearest first.
+
+    Circles of growing radius are searched until one holds limit venues,
+    which are then nearer than any venue outside it. In a dense city only
+    the venues of a small circle are read.
+    """
+    for radius in search_radii(radius_km):
+        found = venues_within(latitude, longitude, radius)
+        if len(found) >= limit:
+            break
+
+    return heapq.nsmallest(limit, found, key=lambda venue: venue.distance_km)
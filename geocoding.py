@@ -0,0 +1,119 @@
+import hashlib
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select, update
+from werkzeug.utils import import_string
+
+from geo import encode
+from models import db, utcnow, Venue
+
+# A geocoder is built with the app config and has a geocode(address, city,
+# state) method returning (latitude, longitude), or None for a place it
+# cannot find. GEOCODER names the class used by the geocode-venues command.
+
+CITY_CENTERS = {
+    ('new york', 'NY'): (40.7128, -74.0060),
+    ('los angeles', 'CA'): (34.0522, -118.2437),
+    ('chicago', 'IL'): (41.8781, -87.6298),
+    ('houston', 'TX'): (29.7604, -95.3698),
+    ('phoenix', 'AZ'): (33.4484, -112.0740),
+    ('philadelphia', 'PA'): (39.9526, -75.1652),
+    ('san antonio', 'TX'): (29.4241, -98.4936),
+    ('san diego', 'CA'): (32.7157, -117.1611),
+    ('dallas', 'TX'): (32.7767, -96.7970),
+    ('austin', 'TX'): (30.2672, -97.7431),
+    ('san francisco', 'CA'): (37.7749, -122.4194),
+    ('seattle', 'WA'): (47.6062, -122.3321),
+    ('denver', 'CO'): (39.7392, -104.9903),
+    ('nashville', 'TN'): (36.1627, -86.7816),
+    ('portland', 'OR'): (45.5152, -122.6784),
+    ('new orleans', 'LA'): (29.9511, -90.0715),
+    ('boston', 'MA'): (42.3601, -71.0589),
+    ('detroit', 'MI'): (42.3314, -83.0458),
+    ('memphis', 'TN'): (35.1495, -90.0490),
+    ('atlanta', 'GA'): (33.7490, -84.3880),
+}
+
+
+class FixtureGeocoder:
+    """Offline geocoder for development, tests and benchmarks.
+
+    A venue is placed within SPREAD degrees of its city's center, at an
+    offset derived from its address, so an address always gets the same
+    point. Cities missing from CITY_CENTERS are not found.
+    """
+    SPREAD = 0.15
+
+    def __init__(self, config=None):
+        self.centers = CITY_CENTERS
+
+    def geocode(self, address, city, state):
+        center = self.centers.get((' '.join((city or '').lower().split()), (state or '').strip().upper()))
+        if center is None:
+            return None
+
+        digest = hashlib.sha1((address or '').encode('utf-8')).digest()
+        latitude_offset, longitude_offset = (int.from_bytes(digest[i:i + 4], 'big') / 2 ** 32 * 2 - 1 for i in (0, 4))
+        return center[0] + latitude_offset * self.SPREAD, center[1] + longitude_offset * self.SPREAD
+
+
+def located(venue_id, latitude, longitude):
+    """Bulk UPDATE parameters placing a venue at a point."""
+    return {
+        'id': venue_id,
+        'latitude': latitude,
+        'longitude': longitude,
+        'geohash': encode(latitude, longitude),
+        'updated_at': utcnow(),
+    }
+
+def pending_batches(batch_size, everything=False):
+    """Yield (id, address, city, state) rows of the venues to geocode.
+
+    Batches are read by id, so venues the geocoder did not find are not
+    read again in the same run.
+    """
+    last_id = 0
+    while True:
+        query = select(Venue.id, Venue.address, Venue.city, Venue.state).where(Venue.id > last_id)
+        if not everything:
+            query = query.where(Venue.latitude == None)
+
+        rows = db.session.execute(query.order_by(Venue.id).limit(batch_size)).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+@click.command('geocode-venues')
+@click.option('--batch-size', default=500, show_default=True,
+    help='Venues geocoded, updated and committed together.')
+@click.option('--all', 'everything', is_flag=True,
+    help='Geocode venues that already have coordinates too.')
+@with_appcontext
+def geocode_venues(batch_size, everything):
+    """Set the coordinates of venues from their address.
+
+    Only venues without coordinates are geocoded, unless --all is given;
+    creating a venue, or changing its address, city or state, leaves it
+    without. Each batch is committed on its own.
+    """
+    geocoder = import_string(current_app.config['GEOCODER'])(current_app.config)
+    found = missing = 0
+
+    for rows in pending_batches(batch_size, everything):
+        points = []
+        for venue_id, address, city, state in rows:
+            point = geocoder.geocode(address, city, state)
+            if point is None:
+                missing += 1
+            else:
+                points.append(located(venue_id, *point))
+
+        if points:
+            db.session.execute(update(Venue), points)
+        db.session.commit()
+        found += len(points)
+        click.echo('{} venues located, {} not found.'.format(found, missing))
@@ -0,0 +1,321 @@
+import csv
+import json
+import os
+from datetime import datetime
+from itertools import islice
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import insert
+from werkzeug.datastructures import MultiDict
+
+from bookings import Booking, booked, slots
+from cache import page_cache, INDEX_PAGE, VENUES_PAGE, ARTISTS_PAGE
+from counters import refresh_counters
+from feed import recent_feed
+from forms import VenueForm, ArtistForm, ShowForm
+from models import db, Venue, Artist, Show, Genre, venue_genres, artist_genres
+
+TRUE_VALUES = ('1', 'true', 't', 'yes', 'y', 'on')
+
+# ShowForm.start_time parses this format only; ISO timestamps are
+# rewritten to it before validation.
+SHOW_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+#----------------------------------------------------------------------------#
+# Reading.
+#----------------------------------------------------------------------------#
+
+def read_records(path, fmt):
+    """Yield the records of a CSV or NDJSON file one at a time.
+
+    Malformed NDJSON lines are yielded as None so they are reported like
+    any other invalid record.
+    """
+    with open(path, newline='', encoding='utf-8') as source:
+        if fmt == 'csv':
+            yield from csv.DictReader(source)
+            return
+
+        for line in source:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+def chunked(records, size):
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+def form_data(record, booleans=()):
+    data = MultiDict()
+    for key, value in record.items():
+        if key == 'genres':
+            genres = value if isinstance(value, list) else (value or '').split(',')
+            for genre in genres:
+                if genre.strip():
+                    data.add('genres', genre.strip())
+        elif key in booleans:
+            data.add(key, 'y' if str(value).strip().lower() in TRUE_VALUES else '')
+        else:
+            data.add(key, '' if value is None else str(value))
+    return data
+
+def validate(form_class, record, booleans=()):
+    """Return (form, None) for a valid record, else (None, errors)."""
+    if not isinstance(record, dict):
+        return None, {'record': ['Not a JSON object.']}
+
+    form = form_class(formdata=form_data(record, booleans))
+    if form.validate():
+        return form, None
+    return None, form.errors
+
+#----------------------------------------------------------------------------#
+# Loading.
+#----------------------------------------------------------------------------#
+
+def ensure_genres(names):
+    """Return {name: id} for names, inserting the genres that are missing."""
+    genre_ids = dict(db.session.query(Genre.name, Genre.id).filter(Genre.name.in_(names)))
+    missing = [name for name in names if name not in genre_ids]
+    if missing:
+        created = db.session.execute(
+            insert(Genre).returning(Genre.name, Genre.id),
+            [{'name': name} for name in missing]
+        )
+        genre_ids.update(created.tuples().all())
+    return genre_ids
+
+def insert_entities(model, genre_table, fk_name, rows):
+    ids = db.session.scalars(
+        insert(model).returning(model.id, sort_by_parameter_order=True), rows
+    ).all()
+
+    genres = [row['genres'].split(',') if row['genres'] else [] for row in rows]
+    genre_ids = ensure_genres(sorted({name for names in genres for name in names}))
+    links = [
+        {fk_name: entity_id, 'genre_id': genre_ids[name]}
+        for entity_id, names in zip(ids, genres) for name in names
+    ]
+    if links:
+        db.session.execute(insert(genre_table), links)
+
+    return len(ids)
+
+def venue_row(form):
+    return {
+        'name': form.name.data,
+        'city': form.city.data,
+        'state': form.state.data,
+        'address': form.address.data,
+        'phone': form.phone.data,
+        'image_link': form.image_link.data,
+        'facebook_link': form.facebook_link.data,
+        'genres': ','.join(dict.fromkeys(form.genres.data)),
+        'website': form.website_link.data,
+        'seeking_talent': form.seeking_talent.data,
+        'seeking_description': form.seeking_description.data,
+    }
+
+def artist_row(form):
+    return {
+        'name': form.name.data,
+        'city': form.city.data,
+        'state': form.state.data,
+        'phone': form.phone.data,
+        'image_link': form.image_link.data,
+        'facebook_link': form.facebook_link.data,
+        'genres': ','.join(dict.fromkeys(form.genres.data)),
+        'website_link': form.website_link.data,
+        'seeking_venue': form.seeking_venue.data,
+        'seeking_description': form.seeking_description.data,
+    }
+
+def load_venues(chunk, report):
+    rows = []
+    for number, record in chunk:
+        form, errors = validate(VenueForm, record, booleans=('seeking_talent',))
+        if errors:
+            report(number, errors)
+        else:
+            rows.append(venue_row(form))
+    return insert_entities(Venue, venue_genres, 'venue_id', rows) if rows else 0
+
+def load_artists(chunk, report):
+    rows = []
+    for number, record in chunk:
+        form, errors = validate(ArtistForm, record, booleans=('seeking_venue',))
+        if errors:
+            report(number, errors)
+        else:
+            rows.append(artist_row(form))
+    return insert_entities(Artist, artist_genres, 'artist_id', rows) if rows else 0
+
+def resolve(model, references):
+    """Resolve ids or names to ids with one query per kind of reference.
+
+    Returns {reference: id}; names shared by several rows are left out.
+    """
+    ids = {reference for reference in references if reference.isdigit()}
+    names = references - ids
+
+    resolved = {}
+    if ids:
+        resolved.update(
+            (str(entity_id), entity_id)
+            for (entity_id,) in db.session.query(model.id).filter(model.id.in_([int(i) for i in ids]))
+        )
+    if names:
+        matches = {}
+        for name, entity_id in db.session.query(model.name, model.id).filter(model.name.in_(names)):
+            matches.setdefault(name, []).append(entity_id)
+        resolved.update((name, ids[0]) for name, ids in matches.items() if len(ids) == 1)
+    return resolved
+
+def show_reference(record, kind):
+    reference = record.get(kind + '_id') or record.get(kind + '_name') or ''
+    return str(reference).strip()
+
+def load_shows(chunk, report):
+    valid = []
+    for number, record in chunk:
+        if isinstance(record, dict) and record.get('start_time'):
+            try:
+                start_time = datetime.fromisoformat(str(record['start_time']))
+                record = dict(record, start_time=start_time.strftime(SHOW_TIME_FORMAT))
+            except ValueError:
+                pass
+
+        form, errors = validate(ShowForm, record)
+        if errors:
+            report(number, errors)
+        else:
+            valid.append((number, show_reference(record, 'artist'), show_reference(record, 'venue'), form.start_time.data))
+
+    artists = resolve(Artist, {artist for _, artist, _, _ in valid})
+    venues = resolve(Venue, {venue for _, _, venue, _ in valid})
+
+    bookings = []
+    for number, artist, venue, start_time in valid:
+        errors = {}
+        if artist not in artists:
+            errors['artist'] = ['No single artist matches {!r}.'.format(artist)]
+        if venue not in venues:
+            errors['venue'] = ['No single venue matches {!r}.'.format(venue)]
+
+        if errors:
+            report(number, errors)
+        else:
+            bookings.append((number, Booking(artists[artist], venues[venue], start_time)))
+
+    if not bookings:
+        return 0
+
+    # Double bookings are reported like invalid records instead of failing
+    # the chunk on the unique indexes of Show.
+    already_booked = set(booked([booking for _, booking in bookings]))
+    taken = set()
+    rows = []
+    for number, booking in bookings:
+        if booking in already_booked or taken.intersection(slots(booking)):
+            report(number, {'start_time': ['The artist or the venue already has a show at that time.']})
+        else:
+            taken.update(slots(booking))
+            rows.append(booking._asdict())
+
+    if not rows:
+        return 0
+
+    db.session.execute(insert(Show), rows)
+
+    now = datetime.now()
+    refresh_counters(Venue, Show.venue_id, Venue.id.in_({row['venue_id'] for row in rows}), now)
+    refresh_counters(Artist, Show.artist_id, Artist.id.in_({row['artist_id'] for row in rows}), now)
+    return len(rows)
+
+LOADERS = {
+    'venues': load_venues,
+    'artists': load_artists,
+    'shows': load_shows,
+}
+
+#----------------------------------------------------------------------------#
+# Checkpoints.
+#----------------------------------------------------------------------------#
+
+def read_checkpoint(path, source):
+    """Return how many records of source were already committed."""
+    try:
+        with open(path) as checkpoint:
+            data = json.load(checkpoint)
+    except (OSError, ValueError):
+        return 0
+    return data['records'] if data.get('source') == source else 0
+
+def write_checkpoint(path, source, records):
+    with open(path + '.tmp', 'w') as checkpoint:
+        json.dump({'source': source, 'records': records}, checkpoint)
+    os.replace(path + '.tmp', path)
+
+#----------------------------------------------------------------------------#
+# Command.
+#----------------------------------------------------------------------------#
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(sorted(LOADERS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+    help='Input format. Defaults from the file extension.')
+@click.option('--chunk-size', default=1000, show_default=True,
+    help='Records validated, inserted and committed together.')
+@click.option('--checkpoint', type=click.Path(dir_okay=False),
+    help='Progress file used to resume. Defaults to PATH.checkpoint.')
+@click.option('--restart', is_flag=True, help='Ignore an existing checkpoint.')
+@with_appcontext
+def import_catalog(kind, path, fmt, chunk_size, checkpoint, restart):
+    """Bulk import venues, artists or shows from a CSV or NDJSON file.
+
+    Records are validated with the same forms as the web pages; invalid
+    records are reported and skipped. Shows reference their artist and
+    venue by artist_id/venue_id or by unique artist_name/venue_name.
+    Each chunk is committed on its own, and an interrupted import resumes
+    after the last committed chunk.
+    """
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    source = os.path.abspath(path)
+    checkpoint = checkpoint or path + '.checkpoint'
+    done = 0 if restart else read_checkpoint(checkpoint, source)
+    load = LOADERS[kind]
+
+    def report(number, errors):
+        click.echo('record {}: {}'.format(number, errors), err=True)
+
+    if done:
+        click.echo('Resuming after record {}.'.format(done))
+
+    records = islice(enumerate(read_records(path, fmt), start=1), done, None)
+    imported = 0
+    for chunk in chunked(records, chunk_size):
+        try:
+            imported += load(chunk, report)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        done = chunk[-1][0]
+        write_checkpoint(checkpoint, source, done)
+        click.echo('{} records read, {} {} imported.'.format(done, imported, kind))
+
+    page_cache.invalidate(INDEX_PAGE, VENUES_PAGE, ARTISTS_PAGE)
+    recent_feed.invalidate()
+
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
@@ -0,0 +1,94 @@
+import re
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Literals and bind parameters are replaced so that statements differing only
+# in their values share a fingerprint; expanded IN lists collapse to one item.
+VALUE_RE = re.compile(r"%\(\w+\)s|\$\d+|\?|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+VALUE_LIST_RE = re.compile(r'\(\?(?:\s*,\s*\?)+\)')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestQueries:
+    """Statements a request sent to the database.
+
+    SQLite runs a multi-row INSERT .. RETURNING once per row, where
+    PostgreSQL sends the rows in one statement; such repeats of the
+    previous statement are counted as one query, so budgets hold on both.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+        self.previous = None
+
+    def record(self, statement, seconds, per_row_inserts=False):
+        self.seconds += seconds
+        if per_row_inserts and statement == self.previous and statement.startswith('INSERT') and 'RETURNING' in statement:
+            return
+
+        self.count += 1
+        self.statements[fingerprint(statement)] += 1
+        self.previous = statement
+
+    def repeated(self, threshold):
+        return [(statement, times) for statement, times in self.statements.most_common() if times >= threshold]
+
+
+def fingerprint(statement):
+    statement = VALUE_LIST_RE.sub('(?)', VALUE_RE.sub('?', statement))
+    return ' '.join(statement.split())
+
+def query_budget(limit):
+    """Declare how many queries a view may issue per request."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        context.query_started = time.perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'query_started', None)
+    if started is not None and has_request_context():
+        g.setdefault('queries', RequestQueries()).record(
+            statement, time.perf_counter() - started, conn.dialect.name == 'sqlite'
+        )
+
+def report_queries(response):
+    """Add a Server-Timing header and log likely N+1s and busted budgets.
+
+    With QUERY_BUDGET_STRICT, a view issuing more queries than its
+    @query_budget raises QueryBudgetExceeded instead of logging it.
+    """
+    queries = g.get('queries') or RequestQueries()
+    response.headers.add('Server-Timing', 'db;dur={:.1f};desc="{} queries"'.format(queries.seconds * 1000, queries.count))
+
+    for statement, times in queries.repeated(current_app.config['N_PLUS_ONE_THRESHOLD']):
+        current_app.logger.warning('Possible N+1 in %s %s: %d x %s', request.method, request.path, times, statement)
+
+    budget = getattr(current_app.view_functions.get(request.endpoint), 'query_budget', None)
+    if budget is not None and queries.count > budget:
+        message = '{} {} issued {} queries, over its budget of {}'.format(request.method, request.path, queries.count, budget)
+        if current_app.config['QUERY_BUDGET_STRICT']:
+            raise QueryBudgetExceeded(message)
+        current_app.logger.warning(message)
+
+    return response
+
+def setup_instrumentation(app):
+    if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+
+    app.after_request(report_queries)
@@ -0,0 +1,55 @@
+from collections import namedtuple
+from sys import intern
+
+from sqlalchemy import select
+
+from models import Venue, Artist, Show
+
+# Read models for the listing and detail pages. Each row is one named tuple
+# built from a column-projected query, instead of a dict per row or a
+# hydrated ORM instance that is never written. Templates read their fields
+# as attributes, the same way they read ORM objects.
+
+EntityLink = namedtuple('EntityLink', 'id name')
+EntitySummary = namedtuple('EntitySummary', 'id name num_upcoming_shows')
+EntityTile = namedtuple('EntityTile', 'id name image_link')
+NearbyVenue = namedtuple('NearbyVenue', 'id name city state num_upcoming_shows distance_km')
+ArtistShow = namedtuple('ArtistShow', 'artist_id artist_name artist_image_link start_time')
+VenueShow = namedtuple('VenueShow', 'venue_id venue_name venue_image_link start_time')
+ShowListing = namedtuple('ShowListing', 'venue_id venue_name artist_id artist_name artist_image_link start_time')
+
+def venue_shows(artist_id):
+    """Shows of an artist, with the venue columns VenueShow needs."""
+    return select(
+        Venue.id,
+        Venue.name,
+        Venue.image_link,
+        Show.start_time
+    ).join(Venue, Show.venue_id == Venue.id
+    ).where(Show.artist_id == artist_id)
+
+def artist_shows(venue_id):
+    """Shows at a venue, with the artist columns ArtistShow needs."""
+    return select(
+        Artist.id,
+        Artist.name,
+        Artist.image_link,
+        Show.start_time
+    ).join(Artist, Show.artist_id == Artist.id
+    ).where(Show.venue_id == venue_id)
+
+def split_statements(query, now):
+    """(upcoming, past) statements for a venue_shows() or artist_shows() query."""
+    return (
+        query.where(Show.start_time > now).order_by(Show.start_time),
+        query.where(Show.start_time <= now).order_by(Show.start_time.desc()),
+    )
+
+def read(model, rows):
+    """Build a list of model tuples from an iterable of result rows.
+
+    Iterating a Result directly keeps only one Row alive at a time. Strings
+    are interned, so a name repeated on every show of an artist or venue is
+    held once rather than once per row.
+    """
+    return [model._make([intern(value) if type(value) is str else value for value in row]) for row in rows]
@@ -1,7 +1,7 @@
 """empty message
 
 Revision ID: 0c5ff713aa31
-Revises: 
+Revises: 35f08ba2d95f
 Create Date: 2023-02-10 20:23:32.757172
 
 """
@@ -11,7 +11,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision = '0c5ff713aa31'
-down_revision = None
+down_revision = '35f08ba2d95f'
 branch_labels = None
 depends_on = None
 
@@ -0,0 +1,69 @@
+"""index Show lookups and make its foreign keys NOT NULL
+
+Revision ID: 3395dca198e7
+Revises: be7d0504c1ed
+Create Date: 2026-10-18 11:26:52.904117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3395dca198e7'
+down_revision = 'be7d0504c1ed'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Shows without an artist or venue are left for a person to delete or
+    # fix, rather than dropping them here.
+    orphans = op.get_bind().scalar(sa.text(
+        'SELECT count(*) FROM "Show" WHERE artist_id IS NULL OR venue_id IS NULL'
+    ))
+    if orphans:
+        raise RuntimeError(
+            '{} shows have no artist or no venue; '
+            'set or delete them before upgrading'.format(orphans)
+        )
+
+    with op.batch_alter_table('Show', schema=None) as batch_op:
+        batch_op.alter_column('artist_id',
+               existing_type=sa.INTEGER(),
+               nullable=False)
+        batch_op.alter_column('venue_id',
+               existing_type=sa.INTEGER(),
+               nullable=False)
+        batch_op.drop_constraint('Show_artist_id_fkey', type_='foreignkey')
+        batch_op.drop_constraint('Show_venue_id_fkey', type_='foreignkey')
+        batch_op.create_foreign_key('Show_artist_id_fkey', 'Artist', ['artist_id'], ['id'], ondelete='CASCADE')
+        batch_op.create_foreign_key('Show_venue_id_fkey', 'Venue', ['venue_id'], ['id'], ondelete='CASCADE')
+
+    # Built without locking the tables for writes, which Postgres cannot do
+    # inside a transaction.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_Show_start_time_id', 'Show', ['start_time', 'id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_Venue_city_state', 'Venue', ['city', 'state'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.drop_index('ix_Venue_city_state')
+
+    with op.batch_alter_table('Show', schema=None) as batch_op:
+        batch_op.drop_index('ix_Show_start_time_id')
+        batch_op.drop_index('ix_Show_artist_id_start_time')
+        batch_op.drop_index('ix_Show_venue_id_start_time')
+        batch_op.drop_constraint('Show_venue_id_fkey', type_='foreignkey')
+        batch_op.drop_constraint('Show_artist_id_fkey', type_='foreignkey')
+        batch_op.create_foreign_key('Show_venue_id_fkey', 'Venue', ['venue_id'], ['id'])
+        batch_op.create_foreign_key('Show_artist_id_fkey', 'Artist', ['artist_id'], ['id'])
+        batch_op.alter_column('venue_id',
+               existing_type=sa.INTEGER(),
+               nullable=True)
+        batch_op.alter_column('artist_id',
+               existing_type=sa.INTEGER(),
+               nullable=True)
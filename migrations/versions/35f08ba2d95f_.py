@@ -0,0 +1,60 @@
+"""create the Venue, Artist and Show tables
+
+The app used to create these with db.create_all() at startup, and the
+revisions after this one only alter them. Databases created that way are
+already past this revision; a database that has the tables but was never
+stamped should be stamped with `flask --app app db stamp head`.
+
+Revision ID: 35f08ba2d95f
+Revises: 
+Create Date: 2026-10-18 17:58:12.402113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '35f08ba2d95f'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('Venue',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('city', sa.String(length=120), nullable=True),
+    sa.Column('state', sa.String(length=120), nullable=True),
+    sa.Column('address', sa.String(length=120), nullable=True),
+    sa.Column('phone', sa.String(length=120), nullable=True),
+    sa.Column('image_link', sa.String(length=500), nullable=True),
+    sa.Column('facebook_link', sa.String(length=120), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('Artist',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('city', sa.String(length=120), nullable=True),
+    sa.Column('state', sa.String(length=120), nullable=True),
+    sa.Column('phone', sa.String(length=120), nullable=True),
+    sa.Column('genres', sa.String(length=120), nullable=True),
+    sa.Column('image_link', sa.String(length=500), nullable=True),
+    sa.Column('facebook_link', sa.String(length=120), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('Show',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=True),
+    sa.Column('venue_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], name='Show_artist_id_fkey'),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], name='Show_venue_id_fkey'),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('Show')
+    op.drop_table('Artist')
+    op.drop_table('Venue')
@@ -0,0 +1,33 @@
+"""add latitude, longitude and an indexed geohash to Venue
+
+Revision ID: 3626ea04aabb
+Revises: 9e815b08b7b6
+Create Date: 2026-10-18 18:31:40.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3626ea04aabb'
+down_revision = '9e815b08b7b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled in by `flask geocode-venues`
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('geohash', sa.String(length=12), nullable=True))
+        batch_op.create_index('ix_Venue_geohash', ['geohash'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.drop_index('ix_Venue_geohash')
+        batch_op.drop_column('geohash')
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
@@ -0,0 +1,32 @@
+"""track updated_at on Venue, Artist and Show
+
+Revision ID: 7ebce74c0cd0
+Revises: c5e7f2988dd5
+Create Date: 2026-10-18 14:02:55.871390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7ebce74c0cd0'
+down_revision = 'c5e7f2988dd5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist', 'Show'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+            batch_op.create_index('ix_{}_updated_at'.format(table), ['updated_at'], unique=False)
+
+        op.execute('''UPDATE "{}" SET updated_at = timezone('utc', now())'''.format(table))
+
+
+def downgrade():
+    for table in ('Show', 'Artist', 'Venue'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index('ix_{}_updated_at'.format(table))
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,38 @@
+"""add full-text search vectors and trigram indexes
+
+Revision ID: 90bc0c7dd733
+Revises: 5c237c78d7ad
+Create Date: 2026-10-18 09:12:41.502183
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '90bc0c7dd733'
+down_revision = '5c237c78d7ad'
+branch_labels = None
+depends_on = None
+
+
+SEARCH_VECTOR = "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(city, '') || ' ' || coalesce(state, '') || ' ' || coalesce(genres, ''))"
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    for table in ('Venue', 'Artist'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR, persisted=True), nullable=True))
+            batch_op.create_index('ix_{}_search_vector'.format(table), ['search_vector'], unique=False, postgresql_using='gin')
+            batch_op.create_index('ix_{}_name_trgm'.format(table), ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index('ix_{}_name_trgm'.format(table), postgresql_using='gin')
+            batch_op.drop_index('ix_{}_search_vector'.format(table), postgresql_using='gin')
+            batch_op.drop_column('search_vector')
@@ -0,0 +1,45 @@
+"""refuse double bookings: unique (venue_id, start_time) and (artist_id, start_time) on Show
+
+Revision ID: 9e815b08b7b6
+Revises: 7ebce74c0cd0
+Create Date: 2026-10-18 18:06:12.530917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e815b08b7b6'
+down_revision = '7ebce74c0cd0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing double bookings are left for a person to resolve, rather than
+    # dropping shows here.
+    connection = op.get_bind()
+    for column in ('venue_id', 'artist_id'):
+        conflicts = connection.scalar(sa.text('''
+            SELECT count(*) FROM (
+                SELECT 1 FROM "Show" GROUP BY {column}, start_time HAVING count(*) > 1
+            ) AS conflicts
+        '''.format(column=column)))
+        if conflicts:
+            raise RuntimeError(
+                '{} {} and start_time pairs are shared by several shows; '
+                'move or delete those shows before upgrading'.format(conflicts, column)
+            )
+
+    with op.batch_alter_table('Show', schema=None) as batch_op:
+        for column in ('venue_id', 'artist_id'):
+            batch_op.drop_index('ix_Show_{}_start_time'.format(column))
+            batch_op.create_index('ix_Show_{}_start_time'.format(column), [column, 'start_time'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('Show', schema=None) as batch_op:
+        for column in ('artist_id', 'venue_id'):
+            batch_op.drop_index('ix_Show_{}_start_time'.format(column))
+            batch_op.create_index('ix_Show_{}_start_time'.format(column), [column, 'start_time'], unique=False)
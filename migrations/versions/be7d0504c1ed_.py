@@ -0,0 +1,69 @@
+"""add Genre table and backfill venue/artist genres
+
+Revision ID: be7d0504c1ed
+Revises: 90bc0c7dd733
+Create Date: 2026-10-18 10:04:19.338410
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'be7d0504c1ed'
+down_revision = '90bc0c7dd733'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('Genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('VenueGenre',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id', 'genre_id')
+    )
+    op.create_index('ix_VenueGenre_genre_id', 'VenueGenre', ['genre_id', 'venue_id'], unique=False)
+    op.create_table('ArtistGenre',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('artist_id', 'genre_id')
+    )
+    op.create_index('ix_ArtistGenre_genre_id', 'ArtistGenre', ['genre_id', 'artist_id'], unique=False)
+
+    # Backfill from the comma-joined genres strings, which are kept for display.
+    op.execute('''
+        INSERT INTO "Genre" (name)
+        SELECT DISTINCT trim(genre.name)
+        FROM (
+            SELECT unnest(string_to_array(genres, ',')) AS name FROM "Venue"
+            UNION
+            SELECT unnest(string_to_array(genres, ',')) AS name FROM "Artist"
+        ) AS genre
+        WHERE trim(genre.name) <> ''
+    ''')
+    for table, column in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.execute('''
+            INSERT INTO "{table}Genre" ({column}, genre_id)
+            SELECT DISTINCT entity.id, "Genre".id
+            FROM "{table}" AS entity
+            CROSS JOIN LATERAL unnest(string_to_array(entity.genres, ',')) AS genre(name)
+            JOIN "Genre" ON "Genre".name = trim(genre.name)
+        '''.format(table=table, column=column))
+
+
+def downgrade():
+    op.drop_index('ix_ArtistGenre_genre_id', table_name='ArtistGenre')
+    op.drop_table('ArtistGenre')
+    op.drop_index('ix_VenueGenre_genre_id', table_name='VenueGenre')
+    op.drop_table('VenueGenre')
+    op.drop_table('Genre')
@@ -0,0 +1,50 @@
+"""add denormalized show counters to Venue and Artist
+
+Revision ID: c5e7f2988dd5
+Revises: 3395dca198e7
+Create Date: 2026-10-18 12:41:07.215644
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e7f2988dd5'
+down_revision = '3395dca198e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table, column in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+            batch_op.add_column(sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+            batch_op.add_column(sa.Column('next_show_at', sa.DateTime(), nullable=True))
+            batch_op.create_index('ix_{}_next_show_at'.format(table), ['next_show_at'], unique=False)
+
+        op.execute('''
+            UPDATE "{table}" SET
+                upcoming_shows_count = counts.upcoming,
+                past_shows_count = counts.past,
+                next_show_at = counts.next_show_at
+            FROM (
+                SELECT {column} AS id,
+                       count(*) FILTER (WHERE start_time > LOCALTIMESTAMP) AS upcoming,
+                       count(*) FILTER (WHERE start_time <= LOCALTIMESTAMP) AS past,
+                       min(start_time) FILTER (WHERE start_time > LOCALTIMESTAMP) AS next_show_at
+                FROM "Show"
+                GROUP BY {column}
+            ) AS counts
+            WHERE "{table}".id = counts.id
+        '''.format(table=table, column=column))
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index('ix_{}_next_show_at'.format(table))
+            batch_op.drop_column('next_show_at')
+            batch_op.drop_column('past_shows_count')
+            batch_op.drop_column('upcoming_shows_count')
@@ -1,22 +1,209 @@
+import sqlite3
+import time
+from datetime import datetime, timezone
+from itertools import count
+from threading import Lock
+
+from flask import current_app, g, has_request_context, request
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import DDL, create_engine, event, exc, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.engine import Engine
+
+from pool import engine_options
+
+# Seconds the replica is behind the primary; 0 when it has replayed all the
+# WAL it received, or when it is not a standby at all.
+REPLICA_LAG = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+class Replica:
+    def __init__(self, engine):
+        self.engine = engine
+        self.healthy = True
+        self.checked_at = None
+
+
+class ReplicaSet:
+    """Read replicas taken in turn, skipping those down or lagging."""
+
+    def __init__(self):
+        self.replicas = []
+        self.turn = count()
+        self.lock = Lock()
+        self.max_lag = 0
+        self.check_interval = 0
+
+    def init_app(self, app):
+        self.max_lag = app.config['DB_REPLICA_MAX_LAG']
+        self.check_interval = app.config['DB_REPLICA_CHECK_INTERVAL']
+
+        self.replicas = [
+            Replica(create_engine(url, **engine_options(app.config, url)))
+            for url in app.config['DATABASE_REPLICA_URLS']
+        ]
+
+        for replica in self.replicas:
+            event.listen(replica.engine, 'handle_error', self.on_error(replica))
+
+    def on_error(self, replica):
+        def mark_down(context):
+            if context.is_disconnect or isinstance(context.sqlalchemy_exception, exc.OperationalError):
+                replica.healthy = False
+                replica.checked_at = time.monotonic()
+        return mark_down
+
+    def check(self, replica):
+        try:
+            with replica.engine.connect() as connection:
+                lag = connection.scalar(REPLICA_LAG)
+            replica.healthy = lag is not None and lag <= self.max_lag
+        except exc.DBAPIError:
+            replica.healthy = False
+        replica.checked_at = time.monotonic()
+
+    def choose(self):
+        """Return the engine of the next usable replica, or None."""
+        for _ in range(len(self.replicas)):
+            with self.lock:
+                replica = self.replicas[next(self.turn) % len(self.replicas)]
+
+            if replica.checked_at is None or time.monotonic() - replica.checked_at >= self.check_interval:
+                self.check(replica)
+            if replica.healthy:
+                return replica.engine
+        return None
+
+
+replicas = ReplicaSet()
+
+
+class RoutingSession(Session):
+    """Sends the reads of a request routed by route_reads() to its replica.
+
+    Flushes and INSERT/UPDATE/DELETE statements always go to the primary,
+    and mark the request as having written.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or getattr(clause, 'is_dml', False):
+                g.db_wrote = True
+            elif g.get('db_replica') is not None:
+                return g.db_replica
 
-db = SQLAlchemy()
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Trigram indexes back the substring fallback of the search endpoints.
+event.listen(
+    db.metadata,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
+
+# SQLite only enforces foreign keys, and their ON DELETE CASCADE, when asked
+# to on each connection; relationships with passive_deletes rely on it.
+@event.listens_for(Engine, 'connect')
+def enforce_sqlite_foreign_keys(connection, record):
+    if isinstance(connection, sqlite3.Connection):
+        connection.execute('PRAGMA foreign_keys = ON')
+
+# Time until which a client that wrote reads from the primary. A plain
+# cookie rather than the signed session, which another worker rejects
+# unless SECRET_KEY is the same everywhere; forging it only sends the
+# client's own reads to the primary.
+PRIMARY_COOKIE = 'fyyur_primary_until'
+
+def primary_until():
+    try:
+        return float(request.cookies.get(PRIMARY_COOKIE, 0))
+    except ValueError:
+        return 0
+
+def route_reads():
+    """Route GET and HEAD requests to a replica.
+
+    A client that wrote recently keeps reading from the primary, so the
+    page it is redirected to after a POST shows its own changes.
+    """
+    if request.method in ('GET', 'HEAD') and replicas.replicas and primary_until() < time.time():
+        g.db_replica = replicas.choose()
+
+def stick_to_primary(response):
+    if g.get('db_wrote') and replicas.replicas:
+        seconds = current_app.config['DB_READ_YOUR_WRITES']
+        response.set_cookie(PRIMARY_COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True, samesite='Lax')
+    return response
 
 def setup_db(app):
-    app.config.from_object('config')
+    """Bind db and the read replicas to app.
+
+    Nothing is sent to the database here: the schema is created and
+    changed by the migrations only.
+    """
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
     db.app = app
     db.init_app(app)
 
-    with app.app_context():
-        db.create_all()
+    replicas.init_app(app)
+    app.before_request(route_reads)
+    app.after_request(stick_to_primary)
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def updated_at():
+    return db.Column(db.DateTime, default=utcnow, onupdate=utcnow, index=True)
+
+def search_vector(*columns):
+    document = " || ' ' || ".join("coalesce({}, '')".format(column) for column in columns)
+    return db.Computed("to_tsvector('simple', {})".format(document), persisted=True)
+
+def search_indexes(table):
+    return (
+        db.Index('ix_{}_search_vector'.format(table), 'search_vector', postgresql_using='gin'),
+        db.Index('ix_{}_name_trgm'.format(table), 'name',
+            postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
 
 
     #----------------------------------------------------------------------------#
     # Models.
     #----------------------------------------------------------------------------#
 
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+venue_genres = db.Table('VenueGenre',
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_VenueGenre_genre_id', 'genre_id', 'venue_id'),
+)
+
+artist_genres = db.Table('ArtistGenre',
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_ArtistGenre_genre_id', 'genre_id', 'artist_id'),
+)
+
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = search_indexes('Venue') + (
+        db.Index('ix_Venue_city_state', 'city', 'state'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -30,12 +217,23 @@ class Venue(db.Model):
     website = db.Column(db.String(120))
     seeking_talent = (db.Column(db.Boolean, nullable=False, default=False))
     seeking_description = db.Column(db.String(500))
-    shows = db.relationship("Show", back_populates="venue")
+    search_vector = db.deferred(db.Column(TSVECTOR, search_vector('name', 'city', 'state', 'genres')))
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_at = db.Column(db.DateTime, index=True)
+    # Set by the geocode-venues command; geohash indexes the point for geo.py
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12), index=True)
+    updated_at = updated_at()
+    shows = db.relationship("Show", back_populates="venue", cascade="all, delete", passive_deletes=True)
+    genre_tags = db.relationship("Genre", secondary=venue_genres, passive_deletes=True)
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = search_indexes('Artist')
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -49,17 +247,30 @@ class Artist(db.Model):
     website_link = db.Column(db.String(120))
     seeking_venue=(db.Column(db.Boolean, nullable=False, default=False))
     seeking_description = db.Column(db.String(500))
-    shows = db.relationship("Show", back_populates="artist")
+    search_vector = db.deferred(db.Column(TSVECTOR, search_vector('name', 'city', 'state', 'genres')))
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_at = db.Column(db.DateTime, index=True)
+    updated_at = updated_at()
+    shows = db.relationship("Show", back_populates="artist", cascade="all, delete", passive_deletes=True)
+    genre_tags = db.relationship("Genre", secondary=artist_genres, passive_deletes=True)
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
 class Show(db.Model):
     __tablename__ = 'Show'
+    # Unique: a venue or an artist cannot have two shows at the same time.
+    __table_args__ = (
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time', unique=True),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time', unique=True),
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    artist_id = db.Column(db.Integer, db.ForeignKey("Artist.id"))
-    venue_id = db.Column(db.Integer, db.ForeignKey("Venue.id"))
-    start_time = db.Column(db.DateTime)
+    artist_id = db.Column(db.Integer, db.ForeignKey("Artist.id", ondelete='CASCADE'), nullable=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey("Venue.id", ondelete='CASCADE'), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    updated_at = updated_at()
     artist = db.relationship("Artist", back_populates="shows")
     venue = db.relationship("Venue", back_populates="shows")
 
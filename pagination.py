@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+from models import Show
+
+# Keyset pagination shared by the HTML and JSON listings. Cursors are
+# opaque strings naming the last row of the previous page.
+
+def after_show(query, cursor):
+    """Restrict query to shows after cursor ('start_time,id').
+
+    Raises ValueError for a malformed cursor.
+    """
+    start_time, show_id = cursor.rsplit(',', 1)
+    return query.filter(
+        tuple_(Show.start_time, Show.id) > tuple_(datetime.fromisoformat(start_time), int(show_id))
+    )
+
+def show_cursor(start_time, show_id):
+    return '{},{}'.format(start_time.isoformat(), show_id)
+
+def take_page(rows, page_size, cursor_of):
+    """Split the page_size + 1 rows fetched for a page into (rows, next_cursor)."""
+    if len(rows) <= page_size:
+        return rows, None
+
+    rows = rows[:page_size]
+    return rows, cursor_of(rows[-1])
@@ -0,0 +1,129 @@
+import time
+from threading import Lock
+
+from sqlalchemy import exc
+from sqlalchemy.pool import NullPool, QueuePool
+
+
+class CheckoutMetrics:
+    """Time spent waiting for a pooled connection, per process."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+
+    def record(self, waited, timed_out=False):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool recording how long each checkout waited for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = CheckoutMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+
+        self.metrics.record(time.perf_counter() - started)
+        return connection
+
+
+def engine_options(config, url=None):
+    """SQLAlchemy engine options for url (the primary by default), built from
+    the DB_* settings.
+
+    In PgBouncer mode, pooling is left to PgBouncer: the app opens a server
+    connection per checkout, and psycopg does not prepare statements, which
+    transaction pooling cannot route back to the same server connection.
+    statement_timeout is a startup parameter PgBouncer rejects, so set it on
+    the database role instead there.
+    """
+    url = url or config['SQLALCHEMY_DATABASE_URI']
+    if not url.startswith('postgresql'):
+        return {}
+
+    if config['DB_PGBOUNCER']:
+        return {
+            'poolclass': NullPool,
+            'connect_args': {'prepare_threshold': None},
+        }
+
+    options = {
+        'poolclass': MeteredQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    if config['DB_STATEMENT_TIMEOUT']:
+        options['connect_args'] = {
+            'options': '-c statement_timeout={}'.format(config['DB_STATEMENT_TIMEOUT'])
+        }
+    return options
+
+
+def async_engine_options(config):
+    """The engine_options() equivalent for the asyncpg engine of asgi.py."""
+    if config['DB_PGBOUNCER']:
+        return {
+            'poolclass': NullPool,
+            'connect_args': {'statement_cache_size': 0},
+        }
+
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    if config['DB_STATEMENT_TIMEOUT']:
+        options['connect_args'] = {
+            'server_settings': {'statement_timeout': str(config['DB_STATEMENT_TIMEOUT'])}
+        }
+    return options
+
+def pool_metrics(pool):
+    """Render the pool state in the Prometheus text exposition format."""
+    lines = []
+
+    def metric(name, kind, help, value):
+        lines.append('# HELP fyyur_db_pool_{} {}'.format(name, help))
+        lines.append('# TYPE fyyur_db_pool_{} {}'.format(name, kind))
+        lines.append('fyyur_db_pool_{} {}'.format(name, value))
+
+    if isinstance(pool, QueuePool):
+        metric('size', 'gauge', 'Configured number of pooled connections.', pool.size())
+        metric('connections_in_use', 'gauge', 'Connections currently checked out.', pool.checkedout())
+        metric('connections_idle', 'gauge', 'Connections idle in the pool.', pool.checkedin())
+        metric('overflow', 'gauge', 'Connections opened beyond the pool size.', max(pool.overflow(), 0))
+
+    metrics = getattr(pool, 'metrics', None)
+    if metrics is not None:
+        with metrics.lock:
+            metric('checkouts_total', 'counter', 'Connections checked out.', metrics.checkouts)
+            metric('checkout_wait_seconds_total', 'counter',
+                'Time spent waiting for a connection.', metrics.wait_seconds)
+            metric('checkout_wait_seconds_max', 'gauge',
+                'Longest wait for a connection.', metrics.max_wait_seconds)
+            metric('checkout_timeouts_total', 'counter',
+                'Checkouts that gave up after pool_timeout.', metrics.timeouts)
+
+    return '\n'.join(lines) + '\n'
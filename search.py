@@ -0,0 +1,74 @@
+import re
+
+from sqlalchemy import func, literal, select
+
+from models import db
+
+# Prefix-matching tsquery built from the words of the search term, so that
+# partial input ("musi ho") still hits the GIN index on search_vector.
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+def build_tsquery(term):
+    words = WORD_RE.findall(term)
+    if not words:
+        return None
+
+    return func.to_tsquery('simple', ' & '.join('{}:*'.format(word) for word in words))
+
+def count_matches(model, criterion):
+    return select(func.count(model.id)).where(criterion)
+
+def ranked_page(model, criterion, limit, *order):
+    return select(
+        model.id,
+        model.name,
+        model.upcoming_shows_count
+    ).where(criterion
+    ).order_by(*order
+    ).limit(limit)
+
+def search_statements(model, term, limit):
+    """Generate the statements of a search, receiving each one's result.
+
+    Returns (count, rows) for model rows matching term, best match first.
+    Rows are (id, name, num_upcoming_shows). They are matched on the full-text
+    search_vector and ranked with ts_rank. Terms with no full-text hit fall
+    back to a substring match on the name, which the trigram index serves.
+    Counts are computed by the database and at most limit rows are loaded.
+    """
+    tsquery = build_tsquery(term)
+
+    if tsquery is None:
+        criterion = literal(True)
+        count = (yield count_matches(model, criterion)).scalar()
+        return count, (yield ranked_page(model, criterion, limit, model.name)).all()
+
+    criterion = model.search_vector.op('@@')(tsquery)
+    count = (yield count_matches(model, criterion)).scalar()
+    if count:
+        rank = func.ts_rank(model.search_vector, tsquery)
+        return count, (yield ranked_page(model, criterion, limit, rank.desc(), model.name)).all()
+
+    criterion = model.name.ilike('%{}%'.format(term))
+    count = (yield count_matches(model, criterion)).scalar()
+    return count, (yield ranked_page(model, criterion, limit, model.name)).all()
+
+def search_catalog(model, term, limit):
+    """Run search_statements() on the request's session."""
+    steps = search_statements(model, term, limit)
+    try:
+        statement = next(steps)
+        while True:
+            statement = steps.send(db.session.execute(statement))
+    except StopIteration as done:
+        return done.value
+
+async def search_catalog_async(session, model, term, limit):
+    """Run search_statements() on an AsyncSession."""
+    steps = search_statements(model, term, limit)
+    try:
+        statement = next(steps)
+        while True:
+            statement = steps.send(await session.execute(statement))
+    except StopIteration as done:
+        return done.value